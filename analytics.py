@@ -0,0 +1,382 @@
+### Analytics datasets for /visualization and /filtered_analytics ###
+
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+from models import db, Project
+from filters import compile_filter
+from cache import data_version, get_cache
+
+
+# Financial periods run April-March, labelled e.g. "2024-25", "2024-25 Q1", "2024-25 H2"
+def financial_year(date):
+    if date.month >= 4:
+        return f"{date.year}-{str(date.year+1)[-2:]}"
+    else:
+        return f"{date.year-1}-{str(date.year)[-2:]}"
+
+
+def financial_quarter(date):
+    return f"{financial_year(date)} Q{(date.month - 4) % 12 // 3 + 1}"
+
+
+def financial_half(date):
+    return f"{financial_year(date)} {'H1' if 4 <= date.month <= 9 else 'H2'}"
+
+
+def closure_date_of(project):
+    # A project closes on its final closure date, else its revised PDC, else its original PDC
+    return project.final_closure_date or project.revised_pdc or project.original_pdc
+
+
+def status_by_period(spans, labeler):
+    """Open/Running/Closed counts per financial period in one pass over the projects.
+
+    spans is a list of (sanctioned_date, closure_date) pairs, closure_date may be None.
+    The periods are every period that contains a sanction or closure date, sorted.
+    In each period a project is Open if it was sanctioned in it, else Closed if it
+    closed in it, else Running if it was sanctioned before the period and closes after it.
+
+    Each date is mapped straight to its period index, so Open and Closed are a single
+    increment and Running is a +1/-1 pair in a difference array over the periods
+    strictly between sanction and closure, summed once at the end.
+    """
+    labelled = []
+    label_set = set()
+    for sanctioned, closure in spans:
+        s_label = labeler(sanctioned)
+        c_label = labeler(closure) if closure else None
+        labelled.append((s_label, c_label))
+        label_set.add(s_label)
+        if c_label:
+            label_set.add(c_label)
+
+    labels = sorted(label_set)
+    index = {label: i for i, label in enumerate(labels)}
+    n = len(labels)
+    open_counts = [0] * n
+    closed_counts = [0] * n
+    running_diff = [0] * (n + 1)
+
+    for s_label, c_label in labelled:
+        s_idx = index[s_label]
+        open_counts[s_idx] += 1
+        if c_label is None:
+            end = n
+        else:
+            end = index[c_label]
+            if end != s_idx:
+                closed_counts[end] += 1
+        if s_idx + 1 < end:
+            running_diff[s_idx + 1] += 1
+            running_diff[end] -= 1
+
+    running_counts = []
+    running = 0
+    for i in range(n):
+        running += running_diff[i]
+        running_counts.append(running)
+
+    return labels, {
+        'Running': running_counts,
+        'Closed': closed_counts,
+        'Open': open_counts,
+    }
+
+
+## SQL aggregation layer ##
+
+# Funding histogram brackets in lakhs, [low, high)
+FUNDING_BRACKETS = [
+    (0, 50), (50, 100), (100, 200), (200, 500), (500, 1000), (1000, 5000), (5000, 10000)
+]
+
+
+def _present(column):
+    return (column.isnot(None)) & (column != '')
+
+
+def _institute(academia):
+    # "Dept, Institute" -> "Institute"
+    if ',' in academia:
+        return academia.split(',', 1)[1].strip()
+    return academia.strip()
+
+
+def _first_seen():
+    # Groups are returned in the order their first project appears in id order (the order
+    # the chart has always walked the projects in), so insertion-ordered results and
+    # most_common ties match a row-by-row pass
+    return func.min(Project.id)
+
+
+def _select(spec, *columns):
+    stmt = select(*columns)
+    criteria = compile_filter(spec).whereclause
+    if criteria is not None:
+        stmt = stmt.where(criteria)
+    return stmt
+
+
+# Computed chart datasets keyed by (spec, data version, day); the spec carries the role scope
+analytics_cache = get_cache('analytics', maxsize=64)
+
+
+def get_analytics_data(spec):
+    """Cached chart datasets; recomputed only after a project write (or when the day changes,
+    since the status charts are relative to today)."""
+    key = (spec, data_version(), datetime.today().date())
+    analytics = analytics_cache.get(key)
+    if analytics is None:
+        analytics = compute_analytics_data(spec)
+        analytics_cache.put(key, analytics)
+    return analytics
+
+
+def compute_analytics_data(spec):
+    """Chart datasets for /visualization and /filtered_analytics over the projects matching spec.
+
+    Counts and sums are grouped in SQL over only the columns each chart needs; Python
+    only handles what SQL can't express cleanly here (splitting institute, PI and
+    stakeholder strings, and the per-project date logic).
+    """
+    execute = db.session.execute
+
+    # Administrative Status Pie Chart
+    rows = execute(
+        _select(spec, Project.administrative_status, func.count())
+        .where(_present(Project.administrative_status))
+        .group_by(Project.administrative_status).order_by(_first_seen())
+    )
+    admin_status_counts = {status: count for status, count in rows}
+
+    # Projects Sanctioned Per Year
+    sanction_year = db.extract('year', Project.sanctioned_date)
+    rows = execute(
+        _select(spec, sanction_year, func.count())
+        .where(Project.sanctioned_date.isnot(None))
+        .group_by(sanction_year).order_by(sanction_year)
+    ).all()
+    year_labels = [str(int(y)) for y, _ in rows]
+    year_values = [count for _, count in rows]
+
+    # Donut Chart Data (Projects per Vertical)
+    rows = execute(
+        _select(spec, Project.vertical, func.count())
+        .where(_present(Project.vertical))
+        .group_by(Project.vertical).order_by(_first_seen())
+    )
+    vertical_counts = {vertical: count for vertical, count in rows}
+
+    # Institute charts: grouped by the raw academia string, then folded per institute
+    institute_verticals = defaultdict(set)
+    institute_counts = Counter()
+    rows = execute(
+        _select(spec, Project.academia, Project.vertical, func.count())
+        .where(_present(Project.academia))
+        .group_by(Project.academia, Project.vertical).order_by(_first_seen())
+    )
+    for academia, vertical, count in rows:
+        institute = _institute(academia)
+        institute_counts[institute] += count
+        if vertical:
+            institute_verticals[institute].add(vertical)
+    institute_vertical_counts = {inst: len(verts) for inst, verts in institute_verticals.items()}
+    top_institutes = institute_counts.most_common(10)
+    top_institute_labels = [x[0] for x in top_institutes]
+    top_institute_values = [x[1] for x in top_institutes]
+
+    # Monthly Sanctions by Vertical (Stacked Bar)
+    sanction_month = db.extract('month', Project.sanctioned_date)
+    rows = execute(
+        _select(spec, sanction_year, sanction_month, Project.vertical, func.count())
+        .where(Project.sanctioned_date.isnot(None) & _present(Project.vertical))
+        .group_by(sanction_year, sanction_month, Project.vertical)
+    )
+    monthly_vertical_counts = defaultdict(dict)
+    for year, month, vertical, count in rows:
+        monthly_vertical_counts[f"{int(year):04d}-{int(month):02d}"][vertical] = count
+    stacked_labels = sorted(monthly_vertical_counts.keys())
+    stacked_verticals = sorted({v for counts in monthly_vertical_counts.values() for v in counts})
+    stacked_data = []
+    for vertical in stacked_verticals:
+        data = [monthly_vertical_counts[month].get(vertical, 0) for month in stacked_labels]
+        stacked_data.append({'label': vertical, 'data': data})
+
+    # Projects by Funding Range (Histogram)
+    funding_labels = [f"{low}-{high}L" for (low, high) in FUNDING_BRACKETS]
+    funding_counts = [0 for _ in FUNDING_BRACKETS]
+    bracket = case(
+        *[((Project.cost_lakhs >= low) & (Project.cost_lakhs < high), i) for i, (low, high) in enumerate(FUNDING_BRACKETS)],
+        else_=None
+    )
+    rows = execute(
+        _select(spec, bracket, func.count())
+        .where(Project.cost_lakhs.isnot(None))
+        .group_by(bracket)
+    )
+    for i, count in rows:
+        if i is not None:
+            funding_counts[i] = count
+
+    # Sanctioned Cost Trend per Year
+    rows = execute(
+        _select(spec, sanction_year, func.sum(Project.cost_lakhs))
+        .where(Project.sanctioned_date.isnot(None) & Project.cost_lakhs.isnot(None))
+        .group_by(sanction_year).order_by(sanction_year)
+    ).all()
+    cost_trend_year_labels = [int(y) for y, _ in rows]
+    cost_trend_year_values = [float(total) for _, total in rows]
+
+    # Top PIs: "Dr A / Dr B, Institute" counts once for each name before the comma
+    pi_counts = Counter()
+    rows = execute(
+        _select(spec, Project.pi_name, func.count())
+        .where(_present(Project.pi_name))
+        .group_by(Project.pi_name).order_by(_first_seen())
+    )
+    for pi_name, count in rows:
+        for name in pi_name.split(',')[0].split('/'):
+            clean_name = name.strip()
+            if clean_name:
+                pi_counts[clean_name] += count
+    top_pis = pi_counts.most_common(10)
+    top_pis_labels = [pi[0] for pi in top_pis]
+    top_pis_values = [pi[1] for pi in top_pis]
+
+    # Projects by Stakeholder Lab
+    stakeholder_counts = Counter()
+    rows = execute(
+        _select(spec, Project.stakeholders, func.count())
+        .where(_present(Project.stakeholders))
+        .group_by(Project.stakeholders).order_by(_first_seen())
+    )
+    for stakeholders, count in rows:
+        for lab in str(stakeholders).split(','):
+            if lab.strip():
+                stakeholder_counts[lab.strip()] += count
+    stakeholder_lab_labels = list(stakeholder_counts.keys())
+    stakeholder_lab_values = [stakeholder_counts[k] for k in stakeholder_lab_labels]
+
+    # The remaining charts depend on each project's own dates, and the cost charts add the
+    # costs up one project at a time in id order (so the float totals round exactly as
+    # they always have), so fetch just those columns row by row
+    projects = execute(
+        _select(spec, Project.vertical, Project.academia, Project.cost_lakhs, Project.sanctioned_date,
+                Project.final_closure_date, Project.revised_pdc, Project.original_pdc)
+        .order_by(Project.id)
+    ).all()
+    today = datetime.today().date()
+
+    # Cost vs Institute and Cost vs Vertical
+    cost_vs_institute = defaultdict(float)
+    cost_vs_vertical = defaultdict(float)
+    for p in projects:
+        if p.cost_lakhs:
+            if p.academia:
+                cost_vs_institute[_institute(p.academia)] += float(p.cost_lakhs)
+            if p.vertical:
+                cost_vs_vertical[p.vertical] += float(p.cost_lakhs)
+    cost_institute_labels = list(cost_vs_institute.keys())
+    cost_institute_values = [cost_vs_institute[k] for k in cost_institute_labels]
+    cost_vertical_labels = list(cost_vs_vertical.keys())
+    cost_vertical_values = [cost_vs_vertical[k] for k in cost_vertical_labels]
+
+    # Quarterly, Half-Yearly, Yearly Status Counts
+    spans = [(p.sanctioned_date, closure_date_of(p)) for p in projects if p.sanctioned_date]
+    year_labels_status, year_data_status = status_by_period(spans, financial_year)
+    quarter_labels, quarter_data = status_by_period(spans, financial_quarter)
+    half_labels, half_data = status_by_period(spans, financial_half)
+
+    # Average Project Duration by Sanction Year (in days)
+    duration_by_year = {}
+    for p in projects:
+        if p.sanctioned_date:
+            end_date = p.final_closure_date or p.revised_pdc
+            if end_date:
+                duration_by_year.setdefault(p.sanctioned_date.year, []).append((end_date - p.sanctioned_date).days)
+    avg_duration_labels = sorted([str(y) for y in duration_by_year.keys()])
+    avg_duration_values = [
+        round(sum(duration_by_year[int(y)]) / len(duration_by_year[int(y)]), 1)
+        for y in avg_duration_labels
+    ]
+
+    # Project Status Breakdown by Vertical
+    vertical_status_counts = defaultdict(lambda: {'Running': 0, 'Closed': 0, 'Open': 0})
+    for p in projects:
+        if not p.vertical:
+            continue
+        closure_date = closure_date_of(p)
+        if closure_date and closure_date <= today:
+            vertical_status_counts[p.vertical]['Closed'] += 1
+        elif p.sanctioned_date and p.sanctioned_date.year == today.year and (not closure_date or closure_date > today):
+            vertical_status_counts[p.vertical]['Open'] += 1
+        else:
+            vertical_status_counts[p.vertical]['Running'] += 1
+    vertical_status_labels = sorted(vertical_status_counts.keys())
+    vertical_status_data = {
+        'Running': [vertical_status_counts[v]['Running'] for v in vertical_status_labels],
+        'Closed': [vertical_status_counts[v]['Closed'] for v in vertical_status_labels],
+        'Open': [vertical_status_counts[v]['Open'] for v in vertical_status_labels],
+    }
+
+    # Administrative Status Trend (Line/Area Chart)
+    status_trend = defaultdict(lambda: defaultdict(int))
+    for p in projects:
+        if p.sanctioned_date:
+            start_year = p.sanctioned_date.year
+            closure_date = closure_date_of(p)
+            end_year = closure_date.year if closure_date and closure_date <= today else today.year
+            for year in range(start_year, end_year + 1):
+                if year == end_year and closure_date and closure_date.year == year and closure_date <= today:
+                    status_trend["Completed"][year] += 1
+                else:
+                    status_trend["Ongoing"][year] += 1
+    all_statuses = sorted(status_trend.keys())
+    all_years = sorted({year for status in status_trend.values() for year in status.keys()})
+    status_trend_labels = [str(y) for y in all_years]
+    status_trend_datasets = []
+    for status in all_statuses:
+        data = [status_trend[status].get(y, 0) for y in all_years]
+        status_trend_datasets.append({
+            "label": status,
+            "data": data,
+        })
+
+    return dict(
+        admin_status_counts=admin_status_counts,
+        year_labels=year_labels,
+        year_values=year_values,
+        vertical_counts=vertical_counts,
+        institute_vertical_counts=institute_vertical_counts,
+        cost_institute_labels=cost_institute_labels,
+        cost_institute_values=cost_institute_values,
+        cost_vertical_labels=cost_vertical_labels,
+        cost_vertical_values=cost_vertical_values,
+        stacked_labels=stacked_labels,
+        stacked_verticals=stacked_verticals,
+        stacked_data=stacked_data,
+        quarter_labels=quarter_labels,
+        quarter_data=quarter_data,
+        half_labels=half_labels,
+        half_data=half_data,
+        year_labels_status=year_labels_status,
+        year_data_status=year_data_status,
+        avg_duration_labels=avg_duration_labels,
+        avg_duration_values=avg_duration_values,
+        vertical_status_labels=vertical_status_labels,
+        vertical_status_data=vertical_status_data,
+        funding_labels=funding_labels,
+        funding_counts=funding_counts,
+        top_institute_labels=top_institute_labels,
+        top_institute_values=top_institute_values,
+        top_pis_labels=top_pis_labels,
+        top_pis_values=top_pis_values,
+        status_trend_labels=status_trend_labels,
+        status_trend_datasets=status_trend_datasets,
+        cost_trend_year_labels=cost_trend_year_labels,
+        cost_trend_year_values=cost_trend_year_values,
+        stakeholder_lab_labels=stakeholder_lab_labels,
+        stakeholder_lab_values=stakeholder_lab_values,
+    )
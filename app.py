@@ -3,43 +3,78 @@
 
 ## Imports and Initialization ##
 
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, send_from_directory, session, Response
+from flask import Flask, render_template, redirect, url_for, flash, request, jsonify, session, Response, stream_with_context, abort
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import make_transient_to_detached, undefer_group
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Project, Log
+from models import db, User, Project, Log, ExportJob, Attachment, ProjectStatusEntry, PROJECT_DETAILS
 from forms import LoginForm, ProjectForm, UploadForm, ModifyUserForm
-import datetime as dt
+from filters import (ALL_PROJECTS, check_filter_plans, compile_filter, filter_spec_from_args, has_criteria, project_page,
+                     unfiltered_spec, upcoming_reminders)
+from search import init_search_index, rebuild_search_index, search_projects
+from analytics import get_analytics_data
+from cache import get_cache, init_data_version
+from exports import export_rows, iter_csv, render_pdf
+from bundles import form_entries, iter_zip, project_entries
+from jobs import EXPORT_FORMATS, export_jobs
+from attachments import FORM_ATTACHMENT_KIND, PROJECT_ATTACHMENT_COLUMNS, clean_original_name, original_name_of
+from storage import (GC_GRACE_SECONDS, InvalidUpload, StreamingUploadRequest, UploadFileTooLarge, collect_garbage,
+                     reference_counts, remove_unreferenced, store_stream)
+from status_log import STATUS_KINDS, add_status_entry, latest_status_entries, status_page
+from audit import archive_old_logs, audit_writer, log_filters_from_args, log_page, search_archive
+from metrics import request_metrics
+from profiler import query_profiler
+from sqlite_tuning import sqlite_tuning
+from delivery import file_delivery
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from pytz import timezone
 
-from io import BytesIO
 from flask import send_file
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 
 from flask_migrate import Migrate
-from collections import Counter, defaultdict
 import calendar
+import click
 import os
+import tempfile
 
-import uuid
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
 
-import csv
-from io import StringIO
 
 # Initialize Flask app and database
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'site.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connections kept open per process: request threads, the export workers and the audit writer
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 30}
+# Maximum number of rows returned by the dashboard search box
+app.config['SEARCH_RESULT_LIMIT'] = 50
+# Technical status updates shown per project on the dashboard (older ones load on demand)
+app.config['STATUS_ENTRIES_SHOWN'] = 3
+# Projects per page on the dashboard, /projects, delete and modify pages
+app.config['PROJECT_PAGE_SIZE'] = 50
+# Days ahead covered by the PDC / RAB / GC reminder banners on the dashboard
+app.config['REMINDER_WINDOW_DAYS'] = 30
+# Log rows older than this are moved to the gzip archive by the archive-logs command
+app.config['LOG_RETENTION_DAYS'] = 365
+app.config['LOG_ARCHIVE_DIR'] = os.path.join(app.instance_path, 'log_archive')
+# Requests slower than this are logged with their SQL count and time
+app.config['SLOW_REQUEST_SECONDS'] = 1.0
+# Statement budgets checked by the query profiler in debug/testing (QUERY_BUDGET for other endpoints)
+app.config['QUERY_BUDGETS'] = {'dashboard': 10, 'ajax_search_projects': 8, 'view_logs': 8}
+# Seconds the user loader reuses a user's row before reading it again. Edits made in this
+# process invalidate it at once; other worker processes pick them up within this window, so
+# it only spans the burst of requests behind one page (a deleted or demoted account, or a
+# changed password, keeps its old access elsewhere for at most this long)
+app.config['USER_CACHE_TTL'] = 5
 
 db.init_app(app)
+# WAL and the other SQLITE_PRAGMAS on every connection, checked once at start-up
+sqlite_tuning.init_app(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
@@ -49,6 +84,22 @@ migrate = Migrate(app, db)
 UPLOAD_FOLDER = 'static/forms'
 ALLOWED_EXTENSIONS = {'pdf','doc','docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Unreferenced uploads younger than this are kept (a duplicate upload may be about to reference them)
+app.config['UPLOAD_GC_GRACE_SECONDS'] = GC_GRACE_SECONDS
+# Upload size limits: each file, and the whole request body (checked while it streams in)
+app.config['MAX_UPLOAD_FILE_SIZE'] = 50 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024
+# Uploaded files are written in chunks as the request is parsed, to a private folder (same
+# file system as UPLOAD_FOLDER, so storing one is a rename) until they pass the checks
+app.config['UPLOAD_TEMP_FOLDER'] = os.path.join(app.instance_path, 'upload_tmp')
+os.makedirs(app.config['UPLOAD_TEMP_FOLDER'], exist_ok=True)
+app.request_class = StreamingUploadRequest
+# How downloads of uploaded files are sent: 'python' (from the worker, with Range support),
+# 'x-sendfile' (Apache/lighttpd) or 'x-accel' (nginx, with an internal location at the prefix
+# aliased to UPLOAD_FOLDER)
+app.config['FILE_DELIVERY'] = 'python'
+app.config['FILE_DELIVERY_ACCEL_PREFIX'] = '/protected-uploads/'
+file_delivery.init_app(app)
 
 class NoticeForm(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,35 +109,151 @@ class NoticeForm(db.Model):
     filename = db.Column(db.String(255), nullable=True)  
     filenames = db.Column(db.Text, nullable=True)  
     file_types = db.Column(db.Text, nullable=True)  
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(NoticeForm.id == foreign(Attachment.owner_id), Attachment.owner_type == 'form')",
+        order_by='Attachment.id', lazy='selectin', viewonly=True
+    )
 
 def save_files(files):
+    """Store uploaded files in the content-addressed upload folder.
+
+    Returns (stored_name, size, sha256, original filename) for each file saved.
+    """
     saved_files = []
     for file in files:
         if file and file.filename:
             try:
-                filename = secure_filename(f"{uuid.uuid4()}_{file.filename}")
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                file_type = file.filename.split('.')[-1].lower()
-                saved_files.append((filename, file_type))  
+                stored_name, size, sha256 = store_stream(app.config['UPLOAD_FOLDER'], file.stream, file.filename,
+                                                         temp_folder=app.config['UPLOAD_TEMP_FOLDER'])
+                saved_files.append((stored_name, size, sha256, clean_original_name(file.filename)))
+            except InvalidUpload as e:
+                flash(f"{e} It was not saved.", "danger")
             except Exception as e:
                 print(f"Error saving file {file.filename}: {e}")
     return saved_files
 
+def save_attachments(kind, files):
+    """Save uploaded files and build an Attachment for each; the caller sets the owner and adds them."""
+    files = [file for file in files or [] if hasattr(file, "filename") and file.filename]
+    return [
+        Attachment(kind=kind, stored_name=stored_name, original_name=original_name, size=size, sha256=sha256)
+        for stored_name, size, sha256, original_name in save_files(files)
+    ]
+
+def attach_files(owner_type, owner_id, kind, files):
+    """Save uploaded files as attachments of the owner. Returns the stored names.
+
+    A file whose content the owner already has under the same kind is not attached twice.
+    """
+    attachments = save_attachments(kind, files)
+    attached = set(db.session.execute(
+        db.select(Attachment.stored_name).filter_by(owner_type=owner_type, owner_id=owner_id, kind=kind)
+    ).scalars()) if owner_id is not None else set()
+    for attachment in attachments:
+        if attachment.stored_name in attached:
+            continue
+        attached.add(attachment.stored_name)
+        attachment.owner_type = owner_type
+        attachment.owner_id = owner_id
+        db.session.add(attachment)
+    return [attachment.stored_name for attachment in attachments]
+
+def stored_references(names=None):
+    """Stored file names still referenced by an attachment row or a notice form's file name.
+
+    With names, only those are looked up. Without, every reference is returned for the
+    garbage collector, including the legacy comma-joined columns of unmigrated rows.
+    """
+    if names is not None:
+        names = set(names)
+        referenced = {name for name, count in reference_counts(names).items() if count}
+        referenced.update(db.session.execute(
+            db.select(NoticeForm.filename).where(NoticeForm.filename.in_(list(names)))
+        ).scalars())
+        return referenced
+    referenced = set(db.session.execute(db.select(Attachment.stored_name).distinct()).scalars())
+    legacy_columns = [NoticeForm.filename, NoticeForm.filenames]
+    legacy_rows = db.session.execute(db.select(*legacy_columns)).all()
+    legacy_columns = [getattr(Project, column) for column in PROJECT_ATTACHMENT_COLUMNS.values()]
+    legacy_rows += db.session.execute(db.select(*legacy_columns)).all()
+    for row in legacy_rows:
+        for value in row:
+            for line in (value or '').split('\n'):
+                referenced.update(token.strip() for token in line.split(',') if token.strip())
+    return referenced
+
+def release_stored_files(names):
+    """Delete the stored files among names that nothing references any more. Call after committing."""
+    names = [name for name in names if name]
+    if names:
+        remove_unreferenced(app.config['UPLOAD_FOLDER'], names, stored_references(names),
+                            grace=app.config['UPLOAD_GC_GRACE_SECONDS'])
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Columns of a logged-in user kept by the user loader cache
+USER_CACHE_COLUMNS = ('id', 'username', 'password', 'role', 'coord_scientist')
+user_cache = get_cache('users', maxsize=256, ttl=app.config['USER_CACHE_TTL'])
+
+def format_size(size):
+    # One decimal in MB, or KB for limits under 1 MB (e.g. "50.0 MB", "512.0 KB")
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+# Uploads over MAX_UPLOAD_FILE_SIZE / MAX_CONTENT_LENGTH are cut off while they stream in
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    if isinstance(error, UploadFileTooLarge):
+        message = f"Upload too large: each file may be at most {format_size(app.config['MAX_UPLOAD_FILE_SIZE'])}."
+    else:
+        message = f"Upload too large: a request may be at most {format_size(app.config['MAX_CONTENT_LENGTH'])} in total."
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': False, 'message': message}), 413
+    flash(message, "danger")
+    return redirect(request.referrer or url_for('dashboard'))
+
 # Initialize Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-def log_action(user, action):
+    """Load the session's user, reading the User table at most once per USER_CACHE_TTL.
+
+    The cache holds plain column values, and each request gets its own detached User built
+    from them, so no ORM object is shared between threads. Code that changes the logged-in
+    user must load it into the session first.
+    """
+    values = user_cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, int(user_id))
+        if user is not None:
+            user_cache.put(user_id, {column: getattr(user, column) for column in USER_CACHE_COLUMNS})
+        return user
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+def invalidate_user(user):
+    user_cache.discard(str(user.id))
+
+def log_action(user, action, in_transaction=False):
+    """Record an audit log entry.
+
+    By default the entry is queued for the batched audit writer, so the request does not
+    pay a second commit. in_transaction=True adds it to the current session instead, and
+    it is committed together with the caller's own changes.
+    """
     tz = timezone('Asia/Kolkata')
     now = datetime.now(tz)
+    if not in_transaction and app.config['AUDIT_ASYNC']:
+        audit_writer.record(user.id, action, now)
+        return
     log = Log(user_id=user.id, action=action, timestamp=now)
     db.session.add(log)
-    db.session.commit()
+    if not in_transaction:
+        db.session.commit()
 
 # Rouute for the home page
 @app.route('/home')
@@ -113,510 +280,89 @@ def login():
     return render_template('main/login.html', form=form)
 
 
+def project_status_entries(projects):
+    return latest_status_entries([p.id for p in projects], limit=app.config['STATUS_ENTRIES_SHOWN'])
+
+
+def paged_projects(spec, endpoint):
+    """The page of projects after the ?after= cursor, and the URL of the next page.
+
+    The current query args (the filter) are carried over to the next-page URL.
+    """
+    projects, next_after = project_page(spec, after=request.args.get('after', type=int),
+                                        limit=app.config['PROJECT_PAGE_SIZE'])
+    next_url = None
+    if next_after is not None:
+        args = request.args.to_dict()
+        args['after'] = next_after
+        next_url = url_for(endpoint, **args)
+    return projects, next_url
+
+
+def first_page_url(endpoint):
+    """URL of the first page when a later page is shown, else None."""
+    if 'after' not in request.args:
+        return None
+    args = request.args.to_dict()
+    args.pop('after')
+    return url_for(endpoint, **args)
+
+
 # Route for the project search
 @app.route('/ajax_search_projects')
 @login_required
 def ajax_search_projects():
     query = request.args.get('query', '').strip()
+    next_url = None
     if query:
-        projects = Project.query.filter(
-            (Project.serial_no.ilike(f"%{query}%")) |
-            (Project.title.ilike(f"%{query}%"))
-        ).all()
+        projects = search_projects(query, limit=app.config['SEARCH_RESULT_LIMIT'])
     else:
-        projects = Project.query.all()
+        # An emptied search box goes back to the dashboard's first page
+        spec = filter_spec_from_args(request.args, current_user, restrict_viewer=True)
+        projects, next_url = paged_projects(spec, 'dashboard_rows')
+
+    return render_template('partials/project_table_body.html', projects=projects, next_url=next_url,
+                           status_entries=project_status_entries(projects))
 
-    return render_template('partials/project_table_body.html', projects=projects)
+
+# Route for further pages of dashboard rows, fetched by the "Load more projects" link
+@app.route('/dashboard/rows')
+@login_required
+def dashboard_rows():
+    spec = filter_spec_from_args(request.args, current_user, restrict_viewer=True)
+    projects, next_url = paged_projects(spec, 'dashboard_rows')
+    return render_template('partials/project_table_body.html', projects=projects, next_url=next_url,
+                           status_entries=project_status_entries(projects))
 
 
 # Route for the dashboard
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    query = Project.query
-
-    # Apply role-based filtering
-    if current_user.role == 'manager':
-        # Restrict projects to those with the manager's PI name
-        query = query.filter(Project.scientist.ilike(f"%{current_user.coord_scientist}%"))
-    elif current_user.role == 'viewer':
-        # Restrict viewers to only active projects (optional logic)
-        query = query.filter(Project.administrative_status != 'Completed')
-
-    # Apply additional filters 
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-    cost_min = request.args.get('cost_min', '').strip()
-    cost_max = request.args.get('cost_max', '').strip()
-    sanction_year_start = request.args.get('sanction_year_start', '').strip()
-    sanction_year_end = request.args.get('sanction_year_end', '').strip()
-
-    if column and (value or (column == 'cost_lakhs' and (cost_min or cost_max)) or (column == 'sanction_year' and (sanction_year_start or sanction_year_end))):
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-        elif column == 'vertical':
-            query = query.filter(Project.vertical.ilike(f"%{value}%"))
-        elif column == 'academia':
-            query = query.filter(Project.academia.ilike(f"%{value}%"))
-        elif column == 'pi_name':
-            query = query.filter(Project.pi_name.ilike(f"%{value}%"))
-        elif column == 'coord_lab':
-            query = query.filter(Project.coord_lab.ilike(f"%{value}%"))
-        elif column == 'scientist':
-            query = query.filter(Project.scientist.ilike(f"%{value}%"))
-        elif column == 'cost_lakhs':
-            try:
-                if cost_min:
-                    query = query.filter(Project.cost_lakhs >= float(cost_min))
-                if cost_max:
-                    query = query.filter(Project.cost_lakhs <= float(cost_max))
-            except ValueError:
-                pass
-        elif column in ['sanctioned_date', 'original_pdc', 'revised_pdc']:
-            try:
-                date_value = datetime.strptime(value, "%Y-%m-%d").date()
-                query = query.filter(getattr(Project, column) == date_value)
-            except ValueError:
-                pass
-        elif column == 'administrative_status':
-            query = query.filter(Project.administrative_status.ilike(f"%{value}%"))
-        elif column == 'sanction_year':
-            try:
-                if sanction_year_start:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) >= int(sanction_year_start))
-                if sanction_year_end:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) <= int(sanction_year_end))
-                # fallback for single value (if only value is provided)
-                if not (sanction_year_start or sanction_year_end) and value:
-                    year = int(value)
-                    query = query.filter(db.extract('year', Project.sanctioned_date) == year)
-            except ValueError:
-                pass
-
-    projects = query.order_by(db.cast(Project.serial_no, db.Integer)).all()
+    # Role-based scope (managers see their own projects, viewers only active ones) plus the column filter
+    spec = filter_spec_from_args(request.args, current_user, restrict_viewer=True)
+    projects, next_url = paged_projects(spec, 'dashboard_rows')
 
     # --- Reminder Logic ---
     today = datetime.today().date()
-    soon = today + timedelta(days=30)
-
-    if current_user.role == 'manager':
-        # Only show alerts for projects assigned to this manager
-        manager_projects = [p for p in projects if p.scientist == current_user.coord_scientist]
-        approaching_pdc = [
-            p for p in manager_projects
-            if p.revised_pdc and isinstance(p.revised_pdc, dt.date) and today <= p.revised_pdc <= soon
-            and (not p.administrative_status or p.administrative_status.lower() != "completed")
-        ]
-        approaching_rab = [
-            p for p in manager_projects
-            if p.rab_meeting_date and isinstance(p.rab_meeting_date, dt.date) and today <= p.rab_meeting_date <= soon
-        ]
-        approaching_gc = [
-            p for p in manager_projects
-            if p.gc_meeting_date and isinstance(p.gc_meeting_date, dt.date) and today <= p.gc_meeting_date <= soon
-        ]
-    else:
-        # Admin and viewer see all
-        approaching_pdc = [
-            p for p in projects
-            if p.revised_pdc and isinstance(p.revised_pdc, dt.date) and today <= p.revised_pdc <= soon
-            and (not p.administrative_status or p.administrative_status.lower() != "completed")
-        ]
-        approaching_rab = [
-            p for p in projects
-            if p.rab_meeting_date and isinstance(p.rab_meeting_date, dt.date) and today <= p.rab_meeting_date <= soon
-        ]
-        approaching_gc = [
-            p for p in projects
-            if p.gc_meeting_date and isinstance(p.gc_meeting_date, dt.date) and today <= p.gc_meeting_date <= soon
-        ]
+    soon = today + timedelta(days=app.config['REMINDER_WINDOW_DAYS'])
+    # Managers are only alerted about projects assigned to them exactly
+    scientist = current_user.coord_scientist if current_user.role == 'manager' else None
+    reminders = upcoming_reminders(spec, today, soon, scientist)
 
     return render_template(
         'main/dashboard.html',
         projects=projects,
         user=current_user,
         now=datetime.now(),
-        approaching_pdc=approaching_pdc,
-        approaching_rab=approaching_rab,
-        approaching_gc=approaching_gc
+        approaching_pdc=reminders['revised_pdc'],
+        approaching_rab=reminders['rab_meeting_date'],
+        approaching_gc=reminders['gc_meeting_date'],
+        next_url=next_url,
+        status_entries=project_status_entries(projects)
     )
 
 
-# Helper function to help both /visualization and /filtered_analytics routes 
-def get_analytics_data(projects):
-    from collections import Counter, defaultdict
-    from datetime import datetime
-
-    # Administrative Status Pie Chart
-    admin_status_counts = Counter([p.administrative_status for p in projects if p.administrative_status])
-
-    # Projects Sanctioned Per Year
-    sanction_years = [p.sanctioned_date.year for p in projects if p.sanctioned_date]
-    year_counts = Counter(sanction_years)
-    sorted_years = sorted(year_counts.keys())
-    year_labels = [str(y) for y in sorted_years]
-    year_values = [year_counts[y] for y in sorted_years]
-
-    # Donut Chart Data (Projects per Vertical)
-    vertical_counts = Counter([p.vertical for p in projects if p.vertical])
-
-    # Donut Chart Data (Verticals per Institute)
-    institute_verticals = defaultdict(set)
-    for p in projects:
-        if p.academia and p.vertical:
-            if ',' in p.academia:
-                institute = p.academia.split(',', 1)[1].strip()
-            else:
-                institute = p.academia.strip()
-            institute_verticals[institute].add(p.vertical)
-    institute_vertical_counts = {inst: len(verts) for inst, verts in institute_verticals.items()}
-
-    # Cost vs Institute
-    cost_vs_institute = defaultdict(float)
-    for p in projects:
-        if p.academia and p.cost_lakhs:
-            if ',' in p.academia:
-                institute = p.academia.split(',', 1)[1].strip()
-            else:
-                institute = p.academia.strip()
-            try:
-                cost_vs_institute[institute] += float(p.cost_lakhs)
-            except ValueError:
-                continue
-    cost_institute_labels = list(cost_vs_institute.keys())
-    cost_institute_values = [cost_vs_institute[k] for k in cost_institute_labels]
-
-    # Cost vs Vertical
-    cost_vs_vertical = defaultdict(float)
-    for p in projects:
-        if p.vertical and p.cost_lakhs:
-            try:
-                cost_vs_vertical[p.vertical] += float(p.cost_lakhs)
-            except ValueError:
-                continue
-    cost_vertical_labels = list(cost_vs_vertical.keys())
-    cost_vertical_values = [cost_vs_vertical[k] for k in cost_vertical_labels]
-
-    # Monthly Sanctions by Vertical (Stacked Bar)
-    monthly_vertical_counts = defaultdict(lambda: defaultdict(int))
-    all_verticals = set()
-    for p in projects:
-        if p.sanctioned_date and p.vertical:
-            month = p.sanctioned_date.strftime('%Y-%m')
-            monthly_vertical_counts[month][p.vertical] += 1
-            all_verticals.add(p.vertical)
-    stacked_labels = sorted(monthly_vertical_counts.keys())
-    stacked_verticals = sorted(all_verticals)
-    stacked_data = []
-    for vertical in stacked_verticals:
-        data = [monthly_vertical_counts[month].get(vertical, 0) for month in stacked_labels]
-        stacked_data.append({'label': vertical, 'data': data})
-
-    # Quarterly, Half-Yearly, Yearly Status Counts
-    def get_financial_year(date):
-        if date.month >= 4:
-            return f"{date.year}-{str(date.year+1)[-2:]}"
-        else:
-            return f"{date.year-1}-{str(date.year)[-2:]}"
-    def get_financial_quarter(date):
-        fy = get_financial_year(date)
-        if date.month in [4,5,6]:
-            q = "Q1"
-        elif date.month in [7,8,9]:
-            q = "Q2"
-        elif date.month in [10,11,12]:
-            q = "Q3"
-        else:
-            q = "Q4"
-        return f"{fy} {q}"
-    def get_financial_half(date):
-        fy = get_financial_year(date)
-        if date.month >= 4 and date.month <= 9:
-            h = "H1"
-        else:
-            h = "H2"
-        return f"{fy} {h}"
-
-    fy_set, fq_set, fh_set = set(), set(), set()
-    for p in projects:
-        if not p.sanctioned_date:
-            continue
-        fy_set.add(get_financial_year(p.sanctioned_date))
-        fq_set.add(get_financial_quarter(p.sanctioned_date))
-        fh_set.add(get_financial_half(p.sanctioned_date))
-        closure_date = None
-        if getattr(p, 'final_closure_date', None):
-            closure_date = p.final_closure_date
-        elif getattr(p, 'revised_pdc', None):
-            closure_date = p.revised_pdc
-        elif getattr(p, 'original_pdc', None):
-            closure_date = p.original_pdc
-        if closure_date:
-            fy_set.add(get_financial_year(closure_date))
-            fq_set.add(get_financial_quarter(closure_date))
-            fh_set.add(get_financial_half(closure_date))
-
-    year_labels_status = sorted(fy_set)
-    quarter_labels = sorted(fq_set)
-    half_labels = sorted(fh_set)
-
-    status_period_counts = {
-        'year': {fy: {'Open':0, 'Running':0, 'Closed':0} for fy in year_labels_status},
-        'quarter': {fq: {'Open':0, 'Running':0, 'Closed':0} for fq in quarter_labels},
-        'half': {fh: {'Open':0, 'Running':0, 'Closed':0} for fh in half_labels},
-    }
-
-    for p in projects:
-        if not p.sanctioned_date:
-            continue
-        closure_date = None
-        if getattr(p, 'final_closure_date', None):
-            closure_date = p.final_closure_date
-        elif getattr(p, 'revised_pdc', None):
-            closure_date = p.revised_pdc
-        elif getattr(p, 'original_pdc', None):
-            closure_date = p.original_pdc
-
-        for fy in year_labels_status:
-            fy_start = datetime.strptime(fy.split('-')[0] + '-04-01', '%Y-%m-%d').date()
-            fy_end = datetime.strptime(str(int(fy.split('-')[0])+1) + '-03-31', '%Y-%m-%d').date()
-            if fy_start <= p.sanctioned_date <= fy_end:
-                status_period_counts['year'][fy]['Open'] += 1
-            elif closure_date and fy_start <= closure_date <= fy_end:
-                status_period_counts['year'][fy]['Closed'] += 1
-            elif p.sanctioned_date < fy_start and (not closure_date or closure_date > fy_end):
-                status_period_counts['year'][fy]['Running'] += 1
-
-        for fq in quarter_labels:
-            y, q = fq.split()
-            y_start = int(y.split('-')[0])
-            if q == "Q1":
-                q_start = datetime(y_start, 4, 1).date()
-                q_end = datetime(y_start, 6, 30).date()
-            elif q == "Q2":
-                q_start = datetime(y_start, 7, 1).date()
-                q_end = datetime(y_start, 9, 30).date()
-            elif q == "Q3":
-                q_start = datetime(y_start, 10, 1).date()
-                q_end = datetime(y_start, 12, 31).date()
-            else:
-                q_start = datetime(y_start+1, 1, 1).date()
-                q_end = datetime(y_start+1, 3, 31).date()
-            if q_start <= p.sanctioned_date <= q_end:
-                status_period_counts['quarter'][fq]['Open'] += 1
-            elif closure_date and q_start <= closure_date <= q_end:
-                status_period_counts['quarter'][fq]['Closed'] += 1
-            elif p.sanctioned_date < q_start and (not closure_date or closure_date > q_end):
-                status_period_counts['quarter'][fq]['Running'] += 1
-
-        for fh in half_labels:
-            y, h = fh.split()
-            y_start = int(y.split('-')[0])
-            if h == "H1":
-                h_start = datetime(y_start, 4, 1).date()
-                h_end = datetime(y_start, 9, 30).date()
-            else:
-                h_start = datetime(y_start, 10, 1).date()
-                h_end = datetime(y_start+1, 3, 31).date()
-            if h_start <= p.sanctioned_date <= h_end:
-                status_period_counts['half'][fh]['Open'] += 1
-            elif closure_date and h_start <= closure_date <= h_end:
-                status_period_counts['half'][fh]['Closed'] += 1
-            elif p.sanctioned_date < h_start and (not closure_date or closure_date > h_end):
-                status_period_counts['half'][fh]['Running'] += 1
-
-    quarter_data = {
-        'Running': [status_period_counts['quarter'][q]['Running'] for q in quarter_labels],
-        'Closed': [status_period_counts['quarter'][q]['Closed'] for q in quarter_labels],
-        'Open': [status_period_counts['quarter'][q]['Open'] for q in quarter_labels],
-    }
-    half_data = {
-        'Running': [status_period_counts['half'][h]['Running'] for h in half_labels],
-        'Closed': [status_period_counts['half'][h]['Closed'] for h in half_labels],
-        'Open': [status_period_counts['half'][h]['Open'] for h in half_labels],
-    }
-    year_data_status = {
-        'Running': [status_period_counts['year'][y]['Running'] for y in year_labels_status],
-        'Closed': [status_period_counts['year'][y]['Closed'] for y in year_labels_status],
-        'Open': [status_period_counts['year'][y]['Open'] for y in year_labels_status],
-    }
-
-    # Average Project Duration by Sanction Year (in days)
-    duration_by_year = {}
-    for p in projects:
-        if p.sanctioned_date:
-            end_date = None
-            if p.final_closure_date:
-                end_date = p.final_closure_date
-            elif p.revised_pdc:
-                end_date = p.revised_pdc
-            if end_date:
-                year = p.sanctioned_date.year
-                duration = (end_date - p.sanctioned_date).days
-                duration_by_year.setdefault(year, []).append(duration)
-    avg_duration_labels = sorted([str(y) for y in duration_by_year.keys()])
-    avg_duration_values = [
-        round(sum(duration_by_year[int(y)]) / len(duration_by_year[int(y)]), 1)
-        for y in avg_duration_labels
-    ]
-
-    # Project Status Breakdown by Vertical
-    vertical_status_counts = defaultdict(lambda: {'Running': 0, 'Closed': 0, 'Open': 0})
-    for p in projects:
-        if not p.vertical:
-            continue
-        closure_date = None
-        if getattr(p, 'final_closure_date', None):
-            closure_date = p.final_closure_date
-        elif getattr(p, 'revised_pdc', None):
-            closure_date = p.revised_pdc
-        elif getattr(p, 'original_pdc', None):
-            closure_date = p.original_pdc
-        today = datetime.today().date()
-        if closure_date and closure_date <= today:
-            vertical_status_counts[p.vertical]['Closed'] += 1
-        elif p.sanctioned_date and p.sanctioned_date.year == today.year and (not closure_date or closure_date > today):
-            vertical_status_counts[p.vertical]['Open'] += 1
-        else:
-            vertical_status_counts[p.vertical]['Running'] += 1
-    vertical_status_labels = sorted(vertical_status_counts.keys())
-    vertical_status_data = {
-        'Running': [vertical_status_counts[v]['Running'] for v in vertical_status_labels],
-        'Closed': [vertical_status_counts[v]['Closed'] for v in vertical_status_labels],
-        'Open': [vertical_status_counts[v]['Open'] for v in vertical_status_labels],
-    }
-
-    # Projects by Funding Range (Histogram)
-    funding_brackets = [
-        (0, 50), (50, 100), (100, 200), (200, 500), (500, 1000), (1000, 5000), (5000, 10000)
-    ]
-    funding_labels = [f"{low}-{high}L" for (low, high) in funding_brackets]
-    funding_counts = [0 for _ in funding_brackets]
-    for p in projects:
-        if p.cost_lakhs is not None:
-            for i, (low, high) in enumerate(funding_brackets):
-                if low <= p.cost_lakhs < high:
-                    funding_counts[i] += 1
-                    break
-
-    # Top Institutes by Number of Projects
-    institute_counts = Counter()
-    for p in projects:
-        if p.academia:
-            if ',' in p.academia:
-                institute = p.academia.split(',', 1)[1].strip()
-            else:
-                institute = p.academia.strip()
-            institute_counts[institute] += 1
-    top_n = 10
-    top_institutes = institute_counts.most_common(top_n)
-    top_institute_labels = [x[0] for x in top_institutes]
-    top_institute_values = [x[1] for x in top_institutes]
-
-    pi_names = []
-    for p in projects:
-        if p.pi_name:
-            before_comma = p.pi_name.split(',')[0]
-            for name in before_comma.split('/'):
-                clean_name = name.strip()
-                if clean_name:
-                    pi_names.append(clean_name)
-    pi_counts = Counter(pi_names)
-    top_pis = pi_counts.most_common(10)
-    top_pis_labels = [pi[0] for pi in top_pis]
-    top_pis_values = [pi[1] for pi in top_pis]
-
-    # Administrative Status Trend (Line/Area Chart)
-    status_trend = defaultdict(lambda: defaultdict(int))
-    today = datetime.today().date()
-    for p in projects:
-        if p.sanctioned_date:
-            start_year = p.sanctioned_date.year
-            closure_date = None
-            if getattr(p, 'final_closure_date', None):
-                closure_date = p.final_closure_date
-            elif getattr(p, 'revised_pdc', None):
-                closure_date = p.revised_pdc
-            elif getattr(p, 'original_pdc', None):
-                closure_date = p.original_pdc
-            end_year = closure_date.year if closure_date and closure_date <= today else today.year
-            for year in range(start_year, end_year + 1):
-                if year == end_year and closure_date and closure_date.year == year and closure_date <= today:
-                    status_trend["Completed"][year] += 1
-                else:
-                    status_trend["Ongoing"][year] += 1
-    all_statuses = sorted(status_trend.keys())
-    all_years = sorted({year for status in status_trend.values() for year in status.keys()})
-    status_trend_labels = [str(y) for y in all_years]
-    status_trend_datasets = []
-    for i, status in enumerate(all_statuses):
-        data = [status_trend[status].get(y, 0) for y in all_years]
-        status_trend_datasets.append({
-            "label": status,
-            "data": data,
-        })
-
-    # Sanctioned Cost Trend per Year
-    cost_trend_year = {}
-    for p in projects:
-        if p.sanctioned_date and p.cost_lakhs is not None:
-            year = p.sanctioned_date.year
-            try:
-                cost_trend_year[year] = cost_trend_year.get(year, 0) + float(p.cost_lakhs)
-            except ValueError:
-                continue
-    cost_trend_year_labels = sorted(cost_trend_year.keys())
-    cost_trend_year_values = [cost_trend_year[y] for y in cost_trend_year_labels]
-
-    # Projects by Stakeholder Lab
-    stakeholder_counts = Counter()
-    for p in projects:
-        if p.stakeholders:
-            labs = [lab.strip() for lab in str(p.stakeholders).split(',') if lab.strip()]
-            for lab in labs:
-                stakeholder_counts[lab] += 1
-    stakeholder_lab_labels = list(stakeholder_counts.keys())
-    stakeholder_lab_values = [stakeholder_counts[k] for k in stakeholder_lab_labels]
-
-    return dict(
-        admin_status_counts=admin_status_counts,
-        year_labels=year_labels,
-        year_values=year_values,
-        vertical_counts=vertical_counts,
-        institute_vertical_counts=institute_vertical_counts,
-        cost_institute_labels=cost_institute_labels,
-        cost_institute_values=cost_institute_values,
-        cost_vertical_labels=cost_vertical_labels,
-        cost_vertical_values=cost_vertical_values,
-        stacked_labels=stacked_labels,
-        stacked_verticals=stacked_verticals,
-        stacked_data=stacked_data,
-        quarter_labels=quarter_labels,
-        quarter_data=quarter_data,
-        half_labels=half_labels,
-        half_data=half_data,
-        year_labels_status=year_labels_status,
-        year_data_status=year_data_status,
-        avg_duration_labels=avg_duration_labels,
-        avg_duration_values=avg_duration_values,
-        vertical_status_labels=vertical_status_labels,
-        vertical_status_data=vertical_status_data,
-        funding_labels=funding_labels,
-        funding_counts=funding_counts,
-        top_institute_labels=top_institute_labels,
-        top_institute_values=top_institute_values,
-        top_pis_labels=top_pis_labels,
-        top_pis_values=top_pis_values,
-        status_trend_labels=status_trend_labels,
-        status_trend_datasets=status_trend_datasets,
-        cost_trend_year_labels=cost_trend_year_labels,
-        cost_trend_year_values=cost_trend_year_values,
-        stakeholder_lab_labels=stakeholder_lab_labels,
-        stakeholder_lab_values=stakeholder_lab_values,
-    )
-
 # Route for the Data Analytics Page
 @app.route('/visualization')
 @login_required
@@ -624,8 +370,7 @@ def visualization():
     if current_user.role == 'manager':
         flash("Unauthorized access.", "danger")
         return redirect(url_for('dashboard'))
-    projects = Project.query.all()
-    analytics = get_analytics_data(projects)
+    analytics = get_analytics_data(unfiltered_spec(current_user))
     return render_template('main/visualization.html', filtered=False, **analytics)
 
 
@@ -633,62 +378,8 @@ def visualization():
 @app.route('/filtered_analytics')
 @login_required
 def filtered_analytics():
-    query = Project.query
-    if current_user.role == 'manager':
-        query = query.filter(Project.scientist.ilike(f"%{current_user.coord_scientist}%"))
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-    cost_min = request.args.get('cost_min', '').strip()
-    cost_max = request.args.get('cost_max', '').strip()
-    sanction_year_start = request.args.get('sanction_year_start', '').strip()
-    sanction_year_end = request.args.get('sanction_year_end', '').strip()
-
-    if column and (value or (column == 'cost_lakhs' and (cost_min or cost_max)) or (column == 'sanction_year' and (sanction_year_start or sanction_year_end))):
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-        elif column == 'vertical':
-            query = query.filter(Project.vertical.ilike(f"%{value}%"))
-        elif column == 'academia':
-            query = query.filter(Project.academia.ilike(f"%{value}%"))
-        elif column == 'pi_name':
-            query = query.filter(Project.pi_name.ilike(f"%{value}%"))
-        elif column == 'coord_lab':
-            query = query.filter(Project.coord_lab.ilike(f"%{value}%"))
-        elif column == 'scientist':
-            query = query.filter(Project.scientist.ilike(f"%{value}%"))
-        elif column == 'cost_lakhs':
-            try:
-                if cost_min:
-                    query = query.filter(Project.cost_lakhs >= float(cost_min))
-                if cost_max:
-                    query = query.filter(Project.cost_lakhs <= float(cost_max))
-            except ValueError:
-                pass
-        elif column in ['sanctioned_date', 'original_pdc', 'revised_pdc']:
-            try:
-                date_value = datetime.strptime(value, "%Y-%m-%d").date()
-                query = query.filter(getattr(Project, column) == date_value)
-            except ValueError:
-                pass
-        elif column == 'administrative_status':
-            query = query.filter(Project.administrative_status.ilike(f"%{value}%"))
-        elif column == 'sanction_year':
-            try:
-                if sanction_year_start:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) >= int(sanction_year_start))
-                if sanction_year_end:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) <= int(sanction_year_end))
-                # fallback for single value (if only value is provided)
-                if not (sanction_year_start or sanction_year_end) and value:
-                    year = int(value)
-                    query = query.filter(db.extract('year', Project.sanctioned_date) == year)
-            except ValueError:
-                pass
-
-    projects = query.order_by(db.cast(Project.serial_no, db.Integer)).all()
-    analytics = get_analytics_data(projects)
+    spec = filter_spec_from_args(request.args, current_user)
+    analytics = get_analytics_data(spec)
     return render_template('partials/analytics_charts.html', filtered=True,**analytics)
 
 
@@ -716,46 +407,6 @@ def add_project():
             return render_template('projects/add_project.html', form=form)
         
 
-        signed_forms_filenames = []
-        if form.duely_signed_forms.data:
-            for file in form.duely_signed_forms.data:
-                filename = None
-                saved = save_files([file])
-                if saved:
-                    filename = saved[0][0]
-                if filename:
-                    signed_forms_filenames.append(filename)
-
-        rab_filenames = []
-        if form.rab_minutes.data:
-            for file in form.rab_minutes.data:
-                filename = None
-                saved = save_files([file])
-                if saved:
-                    filename = saved[0][0]
-                if filename:
-                    rab_filenames.append(filename)
-
-        gc_filenames = []
-        if form.gc_minutes.data:
-            for file in form.gc_minutes.data:
-                filename = None
-                saved = save_files([file])
-                if saved:
-                    filename = saved[0][0]
-                if filename:
-                    gc_filenames.append(filename)
-
-        final_report_filenames = []
-        if form.final_report.data:
-            for file in form.final_report.data:
-                filename = None
-                saved = save_files([file])
-                if saved:
-                    filename = saved[0][0]
-                if filename:
-                    final_report_filenames.append(filename)
-
        
         project = Project(
             serial_no=form.serial_no.data,
@@ -773,19 +424,22 @@ def add_project():
             scope_objective=form.scope_objective.data,
             expected_deliverables=form.expected_deliverables.data,
             Outcome_Dovetailing_with_Ongoing_Work=form.Outcome_Dovetailing_with_Ongoing_Work.data,
-            duely_signed_forms=','.join(signed_forms_filenames),
             rab_meeting_date=form.rab_meeting_date.data,
             rab_meeting_held_date=form.rab_meeting_held_date.data,
-            rab_minutes=','.join(rab_filenames),
             gc_meeting_date=form.gc_meeting_date.data,
             gc_meeting_held_date=form.gc_meeting_held_date.data,
-            technical_status=form.technical_status.data,
             administrative_status=form.administrative_status.data,
             final_closure_date=form.final_closure_date.data,
-            final_closure_remarks=form.final_closure_remarks.data,
-            final_report=','.join(final_report_filenames)
+            final_closure_remarks=form.final_closure_remarks.data
         )
         db.session.add(project)
+        db.session.flush()
+        if form.technical_status.data and form.technical_status.data.strip():
+            add_status_entry(project.id, 'technical', current_user.username, form.technical_status.data.strip())
+        attach_files('project', project.id, 'duely_signed_forms', form.duely_signed_forms.data)
+        attach_files('project', project.id, 'rab', form.rab_minutes.data)
+        attach_files('project', project.id, 'gc', form.gc_minutes.data)
+        attach_files('project', project.id, 'final_report', form.final_report.data)
         db.session.commit()
         log_action(current_user, f"Added project '{form.title.data}'")
         flash("Project added successfully.", "success")
@@ -793,26 +447,23 @@ def add_project():
 
     return render_template('projects/add_project.html', form=form)
 
-# Route for the upload form page
+def linked_attachment(owner_type, attachment_id, filename):
+    # A stored file can be shared by several attachments (identical uploads are stored once), so
+    # download names come from the row the link was rendered for, never from a lookup by file name
+    if attachment_id is None:
+        return None
+    return Attachment.query.filter_by(id=attachment_id, owner_type=owner_type, stored_name=filename).first_or_404()
+
+
+# Route for downloading a project file (links to files without an attachment row omit the id)
 @app.route('/uploads/<filename>')
+@app.route('/uploads/<int:attachment_id>/<filename>')
 @login_required
-def uploaded_file(filename):
-    
-    if ' ' in filename:
-        original_name = filename.split(' ', 1)[1]
-    elif filename[:36].count('-') == 4 and filename[36] == '_':
-        original_name = filename[37:]
-    elif '_' in filename:
-        original_name = filename.split('_', 1)[1]
-    else:
-        original_name = filename
+def uploaded_file(filename, attachment_id=None):
+    attachment = linked_attachment('project', attachment_id, filename)
+    original_name = attachment.original_name if attachment else original_name_of(filename)
 
-    return send_from_directory(
-        app.config['UPLOAD_FOLDER'],
-        filename,
-        as_attachment=True,
-        download_name=original_name
-    )
+    return file_delivery.send(filename, original_name, attachment.sha256 if attachment else None)
 
 
 # Route for the upload form page
@@ -827,29 +478,25 @@ def upload_form():
             return render_template('forms/upload_form.html', form=form)
 
         
-        saved_files = save_files(files)
-        if not saved_files:
+        attachments = save_attachments(FORM_ATTACHMENT_KIND, files)
+        if not attachments:
             flash("Failed to save files. Please try again.", "danger")
             return render_template('forms/upload_form.html', form=form)
 
-        
-        filenames = ','.join([file[0] for file in saved_files])  
-        file_types = ','.join([file[1] for file in saved_files])  
-
-        
-        filename = saved_files[0][0] if saved_files else None
-
         try:
             
             notice_form = NoticeForm(
                 form_no=form.form_no.data,
                 title=form.title.data,
                 submission_schedule=form.submission_schedule.data,
-                filename=filename,  
-                filenames=filenames,  
-                file_types=file_types  
+                filename=attachments[0].stored_name
             )
             db.session.add(notice_form)
+            db.session.flush()
+            for attachment in attachments:
+                attachment.owner_type = 'form'
+                attachment.owner_id = notice_form.id
+                db.session.add(attachment)
             db.session.commit()
             log_action(current_user, f"Uploaded form '{form.form_no.data}'")
             flash('Files uploaded successfully!', 'success')
@@ -862,6 +509,13 @@ def upload_form():
     return render_template('forms/upload_form.html', form=form)
 
 
+def delete_form_attachments(form_obj):
+    """Delete a form's attachment rows. Returns the stored names to release after the commit."""
+    names = [attachment.stored_name for attachment in form_obj.attachments] + [form_obj.filename]
+    Attachment.query.filter_by(owner_type='form', owner_id=form_obj.id).delete()
+    return names
+
+
 # Route for listing all forms
 @app.route('/manage_form_action', methods=['POST'])
 @login_required
@@ -877,12 +531,10 @@ def manage_form_action():
         return redirect(url_for('edit_form', form_id=form_id))
     elif action == "delete":
         form_obj = NoticeForm.query.get_or_404(form_id)
-        try:
-            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], form_obj.filename))
-        except Exception:
-            pass
+        released = delete_form_attachments(form_obj)
         db.session.delete(form_obj)
         db.session.commit()
+        release_stored_files(released)
         log_action(current_user, f"Deleted form '{form_obj.form_no}'")
         flash('Form deleted successfully!', 'success')
         return redirect(url_for('forms'))
@@ -897,18 +549,15 @@ def manage_form_action():
 def edit_form(form_id):
     form = NoticeForm.query.get_or_404(form_id)
 
-    
-    files = []
-    if form.filenames:
-        filenames = form.filenames.split(',')
-        file_types = form.file_types.split(',') if form.file_types else [''] * len(filenames)
-        for idx, filename in enumerate(filenames):
-            files.append({
-                'id': idx,  
-                'filename': filename,
-                'original_name': filename.split('_', 1)[-1],  
-                'file_type': file_types[idx] if idx < len(file_types) else ''
-            })
+    files = [
+        {
+            'id': attachment.id,
+            'filename': attachment.stored_name,
+            'original_name': attachment.original_name,
+            'file_type': attachment.file_type
+        }
+        for attachment in form.attachments
+    ]
 
     if request.method == 'POST':
         form.form_no = request.form['form_no']
@@ -917,36 +566,19 @@ def edit_form(form_id):
 
         
         delete_files = request.form.get('delete_files', '')
-        delete_indices = [int(i) for i in delete_files.split(',') if i.strip().isdigit()]
-        filenames = form.filenames.split(',') if form.filenames else []
-        file_types = form.file_types.split(',') if form.file_types else []
-
-        
-        for idx in sorted(delete_indices, reverse=True):
-            if 0 <= idx < len(filenames):
-                try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filenames[idx]))
-                except Exception:
-                    pass
-                del filenames[idx]
-                if idx < len(file_types):
-                    del file_types[idx]
-        form.filenames = ','.join(filenames)
-        form.file_types = ','.join(file_types)
+        delete_ids = [int(i) for i in delete_files.split(',') if i.strip().isdigit()]
+        released = []
+        if delete_ids:
+            for attachment in form.attachments:
+                if attachment.id in delete_ids:
+                    released.append(attachment.stored_name)
+                    db.session.delete(attachment)
 
         # Handle new file uploads
-        uploaded_files = request.files.getlist('form_files')
-        saved_files = save_files(uploaded_files)
-        if saved_files:
-            existing_filenames = form.filenames.split(',') if form.filenames else []
-            existing_file_types = form.file_types.split(',') if form.file_types else []
-            for fname, ftype in saved_files:
-                existing_filenames.append(fname)
-                existing_file_types.append(ftype)
-            form.filenames = ','.join(existing_filenames)
-            form.file_types = ','.join(existing_file_types)
+        attach_files('form', form.id, FORM_ATTACHMENT_KIND, request.files.getlist('form_files'))
 
         db.session.commit()
+        release_stored_files(released)
         log_action(current_user, f"Edited form '{form.form_no}'")
         flash('Form updated successfully!', 'success')
         return redirect(url_for('forms'))
@@ -964,22 +596,11 @@ def delete_file():
     file_id = request.args.get('file_id', type=int)
     form = NoticeForm.query.get_or_404(form_id)
 
-    filenames = form.filenames.split(',') if form.filenames else []
-    file_types = form.file_types.split(',') if form.file_types else []
-
-    if 0 <= file_id < len(filenames):
-        # Remove file from disk
-        try:
-            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filenames[file_id]))
-        except Exception:
-            pass
-        # Remove from lists
-        del filenames[file_id]
-        if file_id < len(file_types):
-            del file_types[file_id]
-        form.filenames = ','.join(filenames)
-        form.file_types = ','.join(file_types)
+    attachment = Attachment.query.filter_by(id=file_id, owner_type='form', owner_id=form.id).first()
+    if attachment:
+        db.session.delete(attachment)
         db.session.commit()
+        release_stored_files([attachment.stored_name])
         log_action(current_user, f"Deleted file from form '{form.form_no}'")
         flash('File deleted successfully!', 'success')
     else:
@@ -996,13 +617,11 @@ def delete_form(form_id):
     if current_user.role != 'admin':
         return "Unauthorized", 403
     form_obj = NoticeForm.query.get_or_404(form_id)
-    # Optionally delete the file from disk
-    try:
-        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], form_obj.filename))
-    except Exception:
-        pass
+    # The form's files are deleted from disk unless another form or project shares them
+    released = delete_form_attachments(form_obj)
     db.session.delete(form_obj)
     db.session.commit()
+    release_stored_files(released)
     log_action(current_user, f"Deleted form '{form_obj.form_no}'")
     flash('Form deleted successfully!', 'success')
     return redirect(url_for('forms'))
@@ -1010,22 +629,28 @@ def delete_form(form_id):
 
 # Route for listing all forms
 @app.route('/forms/<filename>')
+@app.route('/forms/<int:attachment_id>/<filename>')
 @login_required
-def serve_form(filename):
+def serve_form(filename, attachment_id=None):
+    attachment = linked_attachment('form', attachment_id, filename)
+    if attachment:
+        original_name = attachment.original_name
     # If filename starts with a UUID (36 chars + '_'), strip it, else use as-is
-    if len(filename) > 37 and filename[:36].count('-') == 4 and filename[36] == '_':
+    elif len(filename) > 37 and filename[:36].count('-') == 4 and filename[36] == '_':
         original_name = filename[37:]
     else:
         original_name = filename
 
-    print(f"DEBUG: filename={filename}, original_name={original_name}")
+    return file_delivery.send(filename, original_name, attachment.sha256 if attachment else None)
 
-    return send_from_directory(
-        app.config['UPLOAD_FOLDER'],
-        filename,
-        as_attachment=True,
-        download_name=original_name
-    )
+
+# Route for a ZIP of all files of one form
+@app.route('/form_bundle/<int:form_id>')
+@login_required
+def download_form_bundle(form_id):
+    form_obj = NoticeForm.query.get_or_404(form_id)
+    filename = f"{secure_filename(form_obj.form_no) or 'form'}_files.zip"
+    return bundle_response(form_entries(form_obj.id), filename)
 
 
 
@@ -1038,19 +663,56 @@ def post_technical_status(project_id):
         return jsonify({'success': False, 'message': 'Only admins can update Technical Status.'}), 403
     technical_status = request.form.get('technical_status', '').strip()
     if technical_status:
-        # Append technical_status with username and timestamp (optional)
-        timestamp = datetime.now(timezone('Asia/Kolkata')).strftime('%Y-%m-%d %H:%M')
-        new_technical_status = f"{current_user.username} ({timestamp}): {technical_status}"
-        if project.technical_status:
-            project.technical_status += "\n" + new_technical_status
-        else:
-            project.technical_status = new_technical_status
+        # Appended as a new entry with username and timestamp
+        entry = add_status_entry(project.id, 'technical', current_user.username, technical_status)
         db.session.commit()
         log_action(current_user, f"Updated technical status of project '{project.title}'")
-        return jsonify({'success': True, 'technical_status': new_technical_status})
+        return jsonify({'success': True, 'technical_status': entry.line})
     return jsonify({'success': False, 'message': 'Technical Status cannot be empty.'}), 400
 
 
+# Long text fields shown when a dashboard row is expanded
+PROJECT_DETAIL_FIELDS = ('scope_objective', 'Outcome_Dovetailing_with_Ongoing_Work', 'final_closure_remarks')
+
+
+# Route for the deferred text fields of one project, loaded when its row is expanded
+@app.route('/project_details/<int:project_id>', methods=['GET'])
+@login_required
+def project_details(project_id):
+    # Same role scope as the project listings
+    stmt = compile_filter(unfiltered_spec(current_user)).where(Project.id == project_id)
+    row = db.session.execute(
+        stmt.with_only_columns(*(getattr(Project, field) for field in PROJECT_DETAIL_FIELDS))
+    ).first()
+    if row is None:
+        return jsonify({'success': False, 'message': 'Project not found.'}), 404
+    return jsonify({'success': True, 'project': dict(zip(PROJECT_DETAIL_FIELDS, row))})
+
+
+# Route for paging through older technical status / minutes entries (newest first)
+@app.route('/project_status/<int:project_id>/<kind>', methods=['GET'])
+@login_required
+def project_status_entries_page(project_id, kind):
+    if kind not in STATUS_KINDS:
+        return jsonify({'success': False, 'message': 'Unknown status kind.'}), 404
+    # Same role scope as the project listings
+    stmt = compile_filter(unfiltered_spec(current_user)).where(Project.id == project_id)
+    if db.session.execute(stmt.with_only_columns(Project.id)).first() is None:
+        return jsonify({'success': False, 'message': 'Project not found.'}), 404
+    before = request.args.get('before', type=int)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    entries = status_page(project_id, kind, before=before, limit=limit)
+    return jsonify({
+        'success': True,
+        'entries': [
+            {'id': e.id, 'author': e.author, 'timestamp': e.timestamp.isoformat() if e.timestamp else None,
+             'text': e.text, 'line': e.line}
+            for e in entries
+        ],
+        'next_before': entries[-1].id if len(entries) == limit else None
+    })
+
+
 
 
 # Route to post administrative status updates
@@ -1108,10 +770,7 @@ def post_rab_minutes_of_meeting(project_id):
     rab_minutes = request.form.get('rab_minutes', '').strip()
     if rab_minutes:
         new_rab_minutes = f"{rab_minutes}"
-        if project.rab_minutes:
-            project.rab_minutes += "\n" + new_rab_minutes
-        else:
-            project.rab_minutes = new_rab_minutes
+        add_status_entry(project.id, 'rab', current_user.username, new_rab_minutes)
         db.session.commit()
         log_action(current_user, f"Updated RAB Minutes of Meeting '{project.title}'")
         return jsonify({'success': True, 'rab_minutes': new_rab_minutes})
@@ -1178,10 +837,7 @@ def post_gc_minutes_of_meeting(project_id):
     gc_minutes = request.form.get('gc_minutes', '').strip()
     if gc_minutes:
         new_gc_minutes = f"{gc_minutes}"
-        if project.gc_minutes:
-            project.gc_minutes += "\n" + new_gc_minutes
-        else:
-            project.gc_minutes = new_gc_minutes
+        add_status_entry(project.id, 'gc', current_user.username, new_gc_minutes)
         db.session.commit()
         log_action(current_user, f"Updated GC Minutes of Meeting '{project.title}'")
         return jsonify({'success': True, 'gc_minutes': new_gc_minutes})
@@ -1197,54 +853,13 @@ def modify_search():
         flash("Unauthorized access.", "danger")
         return redirect(url_for('dashboard'))
 
-    query = Project.query
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-
-    if column and value:
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-        elif column == 'vertical':
-            query = query.filter(Project.vertical.ilike(f"%{value}%"))
-        elif column == 'academia':
-            query = query.filter(Project.academia.ilike(f"%{value}%"))
-        elif column == 'pi_name':
-            query = query.filter(Project.pi_name.ilike(f"%{value}%"))
-        elif column == 'coord_lab':
-            query = query.filter(Project.coord_lab.ilike(f"%{value}%"))
-        elif column == 'scientist':
-            query = query.filter(Project.scientist.ilike(f"%{value}%"))
-        elif column == 'cost_lakhs':
-            try:
-                cost = float(value)
-                query = query.filter(Project.cost_lakhs == cost)
-            except ValueError:
-                pass
-        elif column == 'sanctioned_date':
-            try:
-                query = query.filter(Project.sanctioned_date == value)
-            except ValueError:
-                pass
-        elif column == 'original_pdc':
-            try:
-                query = query.filter(Project.original_pdc == value)
-            except ValueError:
-                pass
-        elif column == 'revised_pdc':
-            try:
-                query = query.filter(Project.revised_pdc == value)
-            except ValueError:
-                pass
-        elif column == 'administrative_status':
-            query = query.filter(Project.administrative_status.ilike(f"%{value}%"))
+    spec = filter_spec_from_args(request.args, current_user, exact_cost=True)
+    projects = next_url = None
+    if has_criteria(spec):
+        projects, next_url = paged_projects(spec, 'modify_search')
 
-        projects = query.all()
-    else:
-        projects = None
-
-    return render_template('projects/modify_search.html', projects=projects)
+    return render_template('projects/modify_search.html', projects=projects, next_url=next_url,
+                           first_url=first_page_url('modify_search'))
 
 
 
@@ -1256,60 +871,32 @@ def edit_project(project_id):
         flash("Unauthorized access.", "danger")
         return redirect(url_for('dashboard'))
 
-    project = Project.query.get_or_404(project_id)
+    # The form shows every field, so the deferred text columns load with the row
+    project = Project.query.options(undefer_group(PROJECT_DETAILS)).get_or_404(project_id)
     form = ProjectForm(obj=project)
 
     if form.validate_on_submit():
         # Date validations (same as in add_project)
         if form.original_pdc.data <= form.sanctioned_date.data:
             flash("Original PDC cannot be before or equal to the Sanctioned Date.", "danger")
-            return render_template('projects/edit_project.html', form=form, project=project)
+            return render_template('projects/edit_project.html', form=form, project=project,
+                                   status_entries=project_status_entries([project]))
         if form.revised_pdc.data < form.original_pdc.data:
             flash("Revised PDC cannot be before the Original PDC.", "danger")
-            return render_template('projects/edit_project.html', form=form, project=project)
-
-        # signed_forms
-        duely_signed_forms_filenames = project.duely_signed_forms.split(',') if project.duely_signed_forms else []
-        if form.duely_signed_forms.data:
-            for file in form.duely_signed_forms.data:
-                if hasattr(file, "filename") and file.filename:
-                    saved = save_files([file])
-                    if saved:
-                        duely_signed_forms_filenames.append(saved[0][0])
-        project.duely_signed_forms = ','.join([f for f in duely_signed_forms_filenames if f])
-
-        # rab_minutes
-        rab_filenames = project.rab_minutes.split(',') if project.rab_minutes else []
-        if form.rab_minutes.data:
-            for file in form.rab_minutes.data:
-                if hasattr(file, "filename") and file.filename:
-                    saved = save_files([file])
-                    if saved:
-                        rab_filenames.append(saved[0][0])
-        project.rab_minutes = ','.join([f for f in rab_filenames if f])
-
-        # gc_minutes
-        gc_filenames = project.gc_minutes.split(',') if project.gc_minutes else []
-        if form.gc_minutes.data:
-            for file in form.gc_minutes.data:
-                if hasattr(file, "filename") and file.filename:
-                    saved = save_files([file])
-                    if saved:
-                        gc_filenames.append(saved[0][0])
-        project.gc_minutes = ','.join([f for f in gc_filenames if f])
-
-        # final_report
-        final_report_filenames = project.final_report.split(',') if project.final_report else []
-        if form.final_report.data:
-            for file in form.final_report.data:
-                if hasattr(file, "filename") and file.filename:
-                    saved = save_files([file])
-                    if saved:
-                        final_report_filenames.append(saved[0][0])
-        project.final_report = ','.join([f for f in final_report_filenames if f])
+            return render_template('projects/edit_project.html', form=form, project=project,
+                                   status_entries=project_status_entries([project]))
+
+        attach_files('project', project.id, 'duely_signed_forms', form.duely_signed_forms.data)
+        attach_files('project', project.id, 'rab', form.rab_minutes.data)
+        attach_files('project', project.id, 'gc', form.gc_minutes.data)
+        attach_files('project', project.id, 'final_report', form.final_report.data)
+
+        # The technical status field adds a new update rather than replacing the history
+        if form.technical_status.data and form.technical_status.data.strip():
+            add_status_entry(project.id, 'technical', current_user.username, form.technical_status.data.strip())
 
         # Update project
-        exclude_fields = ['duely_signed_forms', 'rab_minutes', 'gc_minutes', 'final_report']
+        exclude_fields = ['duely_signed_forms', 'rab_minutes', 'gc_minutes', 'final_report', 'technical_status']
         for field in form:
             if field.name not in exclude_fields and hasattr(project, field.name):
                 setattr(project, field.name, field.data)
@@ -1319,7 +906,10 @@ def edit_project(project_id):
         flash('Project updated successfully!', 'success')
         return redirect(url_for('dashboard'))
 
-    return render_template('projects/edit_project.html', form=form, project=project)
+    if request.method == 'GET':
+        form.technical_status.data = ''
+    return render_template('projects/edit_project.html', form=form, project=project,
+                           status_entries=project_status_entries([project]))
 
 
 
@@ -1332,28 +922,12 @@ def remove_mom_file(project_id, mom_type, filename):
     if current_user.role != 'admin':
         flash("Unauthorized.", "danger")
         return redirect(url_for('dashboard'))
-    if mom_type == 'duely_signed_forms':
-        files = project.duely_signed_forms.split(',') if project.duely_signed_forms else []
-        files = [f for f in files if f != filename]
-        project.duely_signed_forms = ','.join(files)
-    elif mom_type == 'rab':
-        files = project.rab_minutes.split(',') if project.rab_minutes else []
-        files = [f for f in files if f != filename]
-        project.rab_minutes = ','.join(files)
-    elif mom_type == 'gc':
-        files = project.gc_minutes.split(',') if project.gc_minutes else []
-        files = [f for f in files if f != filename]
-        project.gc_minutes = ','.join(files)
-    elif mom_type == 'final_report':  
-        files = project.final_report.split(',') if project.final_report else []
-        files = [f for f in files if f != filename]
-        project.final_report = ','.join(files)
-    # Optionally delete file from disk
-    try:
-        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-    except Exception:
-        pass
+    removed = Attachment.query.filter_by(owner_type='project', owner_id=project.id, kind=mom_type,
+                                         stored_name=filename).delete()
     db.session.commit()
+    # Only a file this project actually referenced, and nothing else still does, leaves the disk
+    if removed:
+        release_stored_files([filename])
     log_action(current_user, f"Removed {mom_type} file '{filename}' from project '{project.title}'")
     flash("File removed.", "success")
     return redirect(request.referrer or url_for('dashboard'))
@@ -1369,32 +943,31 @@ def delete_project():
         flash("Unauthorized access. You do not have permission to delete projects", "danger")
         return redirect(url_for('dashboard'))
 
-    query = Project.query   
-
-    # Dropdown filter logic
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-    if column and value:
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-
-    projects = query.order_by(Project.serial_no).all()
-
     if request.method == 'POST':
         project_id = request.form.get('project_id')
         project = Project.query.get(project_id)
         if project:
+            released = [attachment.stored_name for attachment in project.attachments]
+            Attachment.query.filter_by(owner_type='project', owner_id=project.id).delete()
+            ProjectStatusEntry.query.filter_by(project_id=project.id).delete()
             db.session.delete(project)
+            log_action(current_user, f"Deleted project '{project.title}'", in_transaction=True)
             db.session.commit()
-            log_action(current_user, f"Deleted project '{project.title}'")
+            release_stored_files(released)
             flash("Project deleted successfully.", "success")
             return redirect(url_for('delete_project'))
         else:
             flash("Project not found.", "danger")
 
-    return render_template('projects/delete_proj.html', projects=projects, now=datetime.now())
+    # Dropdown filter logic (serial number or nomenclature substring)
+    spec = filter_spec_from_args(request.args, current_user)
+    if spec.column not in ('serial_no', 'title'):
+        spec = unfiltered_spec(current_user)
+    projects, next_url = paged_projects(spec, 'delete_project')
+
+    return render_template('projects/delete_proj.html', projects=projects, next_url=next_url,
+                           first_url=first_page_url('delete_project'),
+                           now=datetime.now())
 
 
 
@@ -1407,24 +980,12 @@ def upload_mom(project_id, mom_type):
         flash("Unauthorized.", "danger")
         return redirect(url_for('dashboard'))
     file = request.files.get('mom_file')
-    if file and file.filename.endswith('.pdf'):
-        saved = save_files([file])
-        if saved:
-            filename = saved[0][0]
-        if mom_type == 'duely_signed_forms':
-            files = project.duely_signed_forms.split(',') if project.duely_signed_forms else []
-            files.append(filename)
-            project.duely_signed_forms = ','.join(files)
-        elif mom_type == 'rab':
-            files = project.rab_minutes.split(',') if project.rab_minutes else []
-            files.append(filename)
-            project.rab_minutes = ','.join(files)
-        elif mom_type == 'gc':
-            files = project.gc_minutes.split(',') if project.gc_minutes else []
-            files.append(filename)
-            project.gc_minutes = ','.join(files)
+    stored_names = []
+    if file and file.filename.endswith('.pdf') and mom_type in PROJECT_ATTACHMENT_COLUMNS:
+        stored_names = attach_files('project', project.id, mom_type, [file])
+    if stored_names:
         db.session.commit()
-        log_action(current_user, f"Uploaded {mom_type} file '{filename}' to project '{project.title}'")
+        log_action(current_user, f"Uploaded {mom_type} file '{stored_names[0]}' to project '{project.title}'")
         flash("PDF attached successfully.", "success")
     else:
         flash("Please upload a valid PDF file.", "danger")
@@ -1436,57 +997,9 @@ def upload_mom(project_id, mom_type):
 @app.route('/download_csv', methods=['GET'])
 @login_required
 def download_csv():
-    projects = Project.query.order_by(db.cast(Project.serial_no, db.Integer)).all()
-    output = StringIO()
-    writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
-
-    # Header row (same as filtered, no minutes columns)
-    writer.writerow([
-        "S. No", "Nomenclature", "Academia/Institute", "PI Name", "Coordinating Lab",
-        "Coordinating Lab Scientist", "Research Vertical", "Sanctioned Cost (in Lakhs)",
-        "Sanctioned Date", "Original PDC", "Revised PDC", "Stake Holding Labs",
-        "Scope/Objective of the Project", "Expected Deliverables/Technology",
-        "Outcome Dovetailing with Ongoing Work", "RAB Meeting Scheduled Date",
-        "RAB Meeting Held Date", "GC Meeting Scheduled Date",
-        "GC Meeting Held Date", "Technical Status",
-        "Administrative Status", "Final Closure Status"
-    ])
-
-    for project in projects:
-        writer.writerow([
-            project.serial_no,
-            project.title or '',
-            project.academia or '',
-            project.pi_name or '',
-            project.coord_lab or '',
-            project.scientist or '',
-            project.vertical or '',
-            project.cost_lakhs or '',
-            project.sanctioned_date or '',
-            project.original_pdc or '',
-            project.revised_pdc or '',
-            project.stakeholders or '',
-            project.scope_objective or '',
-            project.expected_deliverables or '',
-            project.Outcome_Dovetailing_with_Ongoing_Work or '',
-            project.rab_meeting_date or '',
-            project.rab_meeting_held_date or '',
-            project.gc_meeting_date or '',
-            project.gc_meeting_held_date or '',
-            (project.technical_status or '').replace('\n', ' | '),
-            project.administrative_status or '',
-            (str(project.final_closure_date) if project.final_closure_date else '') +
-            (" | " + project.final_closure_remarks if project.final_closure_remarks else "")
-        ])
-
-    output.seek(0)
     current_date = datetime.now().strftime("%Y-%m-%d")
     filename = f"DIA_CoE_{current_date}.csv"
-    response = app.response_class(
-        response=output.getvalue(),
-        status=200,
-        mimetype='text/csv'
-    )
+    response = Response(stream_with_context(iter_csv(export_rows(ALL_PROJECTS))), status=200, mimetype='text/csv')
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
@@ -1495,406 +1008,124 @@ def download_csv():
 @app.route('/download_filtered_csv', methods=['GET'])
 @login_required
 def download_filtered_csv():
-    query = Project.query
-    if current_user.role == 'manager':
-        query = query.filter(Project.scientist.ilike(f"%{current_user.coord_scientist}%"))
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-    cost_min = request.args.get('cost_min', '').strip()
-    cost_max = request.args.get('cost_max', '').strip()
-    sanction_year_start = request.args.get('sanction_year_start', '').strip()
-    sanction_year_end = request.args.get('sanction_year_end', '').strip()
-
-    if column and (
-        value or 
-        (column == 'cost_lakhs' and (cost_min or cost_max)) or
-        (column == 'sanction_year' and (sanction_year_start or sanction_year_end))
-    ):
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-        elif column == 'vertical':
-            query = query.filter(Project.vertical.ilike(f"%{value}%"))
-        elif column == 'academia':
-            query = query.filter(Project.academia.ilike(f"%{value}%"))
-        elif column == 'pi_name':
-            query = query.filter(Project.pi_name.ilike(f"%{value}%"))
-        elif column == 'coord_lab':
-            query = query.filter(Project.coord_lab.ilike(f"%{value}%"))
-        elif column == 'scientist':
-            query = query.filter(Project.scientist.ilike(f"%{value}%"))
-        elif column == 'cost_lakhs':
-            try:
-                if cost_min:
-                    query = query.filter(Project.cost_lakhs >= float(cost_min))
-                if cost_max:
-                    query = query.filter(Project.cost_lakhs <= float(cost_max))
-            except ValueError:
-                pass
-        elif column in ['sanctioned_date', 'original_pdc', 'revised_pdc']:
-            try:
-                date_value = datetime.strptime(value, "%Y-%m-%d").date()
-                query = query.filter(getattr(Project, column) == date_value)
-            except ValueError:
-                pass
-        elif column == 'administrative_status':
-            query = query.filter(Project.administrative_status.ilike(f"%{value}%"))
-        elif column == 'sanction_year':
-            try:
-                if sanction_year_start:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) >= int(sanction_year_start))
-                if sanction_year_end:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) <= int(sanction_year_end))
-                if not (sanction_year_start or sanction_year_end) and value:
-                    year = int(value)
-                    query = query.filter(db.extract('year', Project.sanctioned_date) == year)
-            except ValueError:
-                pass
-
-    projects = query.order_by(db.cast(Project.serial_no, db.Integer)).all()
-    output = StringIO()
-    writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
-
-    # Header row (same as original, no minutes columns)
-    writer.writerow([
-        "S. No", "Nomenclature", "Academia/Institute", "PI Name", "Coordinating Lab",
-        "Coordinating Lab Scientist", "Research Vertical", "Sanctioned Cost (in Lakhs)",
-        "Sanctioned Date", "Original PDC", "Revised PDC", "Stake Holding Labs",
-        "Scope/Objective of the Project", "Expected Deliverables/Technology",
-        "Outcome Dovetailing with Ongoing Work", "RAB Meeting Scheduled Date",
-        "RAB Meeting Held Date", "GC Meeting Scheduled Date",
-        "GC Meeting Held Date", "Technical Status",
-        "Administrative Status", "Final Closure Status"
-    ])
-
-    for project in projects:
-        writer.writerow([
-            project.serial_no,
-            project.title or '',
-            project.academia or '',
-            project.pi_name or '',
-            project.coord_lab or '',
-            project.scientist or '',
-            project.vertical or '',
-            project.cost_lakhs or '',
-            project.sanctioned_date or '',
-            project.original_pdc or '',
-            project.revised_pdc or '',
-            project.stakeholders or '',
-            project.scope_objective or '',
-            project.expected_deliverables or '',
-            project.Outcome_Dovetailing_with_Ongoing_Work or '',
-            project.rab_meeting_date or '',
-            project.rab_meeting_held_date or '',
-            project.gc_meeting_date or '',
-            project.gc_meeting_held_date or '',
-            (project.technical_status or '').replace('\n', ' | '),
-            project.administrative_status or '',
-            (str(project.final_closure_date) if project.final_closure_date else '') +
-            (" | " + project.final_closure_remarks if project.final_closure_remarks else "")
-        ])
-
-    output.seek(0)
+    spec = filter_spec_from_args(request.args, current_user)
     current_date = datetime.now().strftime("%Y-%m-%d")
     filename = f"DIA_CoE_filtered_{current_date}.csv"
-    response = app.response_class(
-        response=output.getvalue(),
-        status=200,
-        mimetype='text/csv'
-    )
+    response = Response(stream_with_context(iter_csv(export_rows(spec))), status=200, mimetype='text/csv')
     response.headers['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
 
 
+def pdf_export_response(spec, filename):
+    # Render into an anonymous temp file rather than memory; send_file closes (and so deletes) it
+    out = tempfile.TemporaryFile()
+    count, timings = render_pdf(export_rows(spec), out)
+    app.logger.info(
+        "PDF export %s: %d projects, fetch+serialize %.2fs, layout+write %.2fs, total %.2fs",
+        filename, count, timings['fetch_serialize'], timings['layout_write'], timings['total']
+    )
+    out.seek(0)
+    return send_file(out, as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+
 # Route for the download PDF
 @app.route('/download_pdf', methods=['GET'])
 @login_required
 def download_pdf():
-    projects = Project.query.order_by(db.cast(Project.serial_no, db.Integer)).all()
-
-    buffer = BytesIO()
-    page_width, page_height = landscape(A4)
-    margin = 30
-    available_width = page_width - 2 * margin
-
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=margin, rightMargin=margin)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    wrap_style = styles['Normal']
-    wrap_style.fontSize = 7
-    wrap_style.leading = 9
-
-    # Header row using Paragraph for wrapped text
-    header_row = [
-        Paragraph("S. No.", wrap_style),
-        Paragraph("Nomenclature", wrap_style),
-        Paragraph("Academia / Institute", wrap_style),
-        Paragraph("PI Name", wrap_style),
-        Paragraph("Coordinating Lab", wrap_style),
-        Paragraph("Coordinating Lab Scientist", wrap_style),
-        Paragraph("Research Vertical", wrap_style),
-        Paragraph("Cost (Lakhs)", wrap_style),
-        Paragraph("Sanctioned Date", wrap_style),
-        Paragraph("Original PDC", wrap_style),
-        Paragraph("Revised PDC", wrap_style),
-        Paragraph("Stake Holding Labs", wrap_style),
-        Paragraph("Scope / Objective of the Project", wrap_style),
-        Paragraph("Expected Deliverables / Technology", wrap_style),
-        Paragraph("Outcome Dovetailing with Ongoing Work", wrap_style),
-        Paragraph("RAB Meeting Scheduled Date", wrap_style),
-        Paragraph("RAB Meeting Held Date", wrap_style),
-        Paragraph("GC Meeting Scheduled Date", wrap_style),
-        Paragraph("GC Meeting Held Date", wrap_style),
-        Paragraph("Technical Status", wrap_style),
-        Paragraph("Administrative Status", wrap_style),
-        Paragraph("Final Closure Status", wrap_style)
-    ]
-
-    data = [header_row]
-
-    for project in projects:
-        data.append([
-            str(project.serial_no),
-            Paragraph(project.title or '', wrap_style),
-            Paragraph(project.academia or '', wrap_style),
-            Paragraph(project.pi_name or '', wrap_style),
-            Paragraph(project.coord_lab or '', wrap_style),
-            Paragraph(project.scientist or '', wrap_style),
-            Paragraph(project.vertical or '', wrap_style),
-            str(project.cost_lakhs or ''),
-            str(project.sanctioned_date or ''),
-            str(project.original_pdc or ''),
-            str(project.revised_pdc or ''),
-            Paragraph(project.stakeholders or '', wrap_style),
-            Paragraph(project.scope_objective or '', wrap_style),
-            Paragraph(project.expected_deliverables or '', wrap_style),
-            Paragraph(project.Outcome_Dovetailing_with_Ongoing_Work or '', wrap_style),
-            str(project.rab_meeting_date or ''),
-            str(project.rab_meeting_held_date or ''),
-            str(project.gc_meeting_date or ''),
-            str(project.gc_meeting_held_date or ''),
-            Paragraph((project.technical_status or '').replace('\n', '<br/>'), wrap_style),
-            Paragraph(project.administrative_status or '', wrap_style),
-            Paragraph(
-                (project.final_closure_date.strftime('%Y-%m-%d') if project.final_closure_date else '') +
-                ('<br/><b>Remarks:</b> ' + project.final_closure_remarks if project.final_closure_remarks else ''),
-                wrap_style
-            )
-        ])
-
-    # Define proportional column widths
-    col_widths = [
-        20,   # S. No.
-        100,  # Nomenclature
-        65,   # Academia / Institute
-        65,   # PI Name
-        60,   # Coordinating Lab
-        70,   # Coordinating Lab Scientist
-        60,   # Research Vertical
-        50,   # Cost (Lakhs)
-        75,   # Sanctioned Date
-        75,   # Original PDC
-        75,   # Revised PDC
-        70,   # Stake Holding Labs
-        75,   # Scope / Objective of the Project
-        75,   # Expected Deliverables / Technology
-        75,   # Outcome Dovetailing with Ongoing Work
-        75,   # RAB Meeting Scheduled Date
-        75,   # RAB Meeting Held Date
-        75,   # GC Meeting Scheduled Date
-        75,   # GC Meeting Held Date
-        70,   # Technical Status
-        65,   # Administrative Status
-        70,   # Final Closure Status
-    ]
-    scale_factor = available_width / sum(col_widths)
-    col_widths = [w * scale_factor for w in col_widths]
-
-    table = Table(data, colWidths=col_widths, repeatRows=1)
-
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 7),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    buffer.seek(0)
     filename = f"DIA_CoE_{datetime.now().strftime('%Y-%m-%d')}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return pdf_export_response(ALL_PROJECTS, filename)
 
 
 # Route for the download filtered PDF
 @app.route('/download_filtered_pdf', methods=['GET'])
 @login_required
 def download_filtered_pdf():
-    query = Project.query
-    if current_user.role == 'manager':
-        query = query.filter(Project.scientist.ilike(f"%{current_user.coord_scientist}%"))
-    column = request.args.get('column', '')
-    value = request.args.get('value', '').strip()
-    cost_min = request.args.get('cost_min', '').strip()
-    cost_max = request.args.get('cost_max', '').strip()
-    sanction_year_start = request.args.get('sanction_year_start', '').strip()
-    sanction_year_end = request.args.get('sanction_year_end', '').strip()
-
-    if column and (
-        value or 
-        (column == 'cost_lakhs' and (cost_min or cost_max)) or
-        (column == 'sanction_year' and (sanction_year_start or sanction_year_end))
-    ):
-        if column == 'serial_no':
-            query = query.filter(Project.serial_no.ilike(f"%{value}%"))
-        elif column == 'title':
-            query = query.filter(Project.title.ilike(f"%{value}%"))
-        elif column == 'vertical':
-            query = query.filter(Project.vertical.ilike(f"%{value}%"))
-        elif column == 'academia':
-            query = query.filter(Project.academia.ilike(f"%{value}%"))
-        elif column == 'pi_name':
-            query = query.filter(Project.pi_name.ilike(f"%{value}%"))
-        elif column == 'coord_lab':
-            query = query.filter(Project.coord_lab.ilike(f"%{value}%"))
-        elif column == 'scientist':
-            query = query.filter(Project.scientist.ilike(f"%{value}%"))
-        elif column == 'cost_lakhs':
-            try:
-                if cost_min:
-                    query = query.filter(Project.cost_lakhs >= float(cost_min))
-                if cost_max:
-                    query = query.filter(Project.cost_lakhs <= float(cost_max))
-            except ValueError:
-                pass
-        elif column in ['sanctioned_date', 'original_pdc', 'revised_pdc']:
-            try:
-                date_value = datetime.strptime(value, "%Y-%m-%d").date()
-                query = query.filter(getattr(Project, column) == date_value)
-            except ValueError:
-                pass
-        elif column == 'administrative_status':
-            query = query.filter(Project.administrative_status.ilike(f"%{value}%"))
-        elif column == 'sanction_year':
-            try:
-                if sanction_year_start:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) >= int(sanction_year_start))
-                if sanction_year_end:
-                    query = query.filter(db.extract('year', Project.sanctioned_date) <= int(sanction_year_end))
-                # fallback for single value (if only value is provided)
-                if not (sanction_year_start or sanction_year_end) and value:
-                    year = int(value)
-                    query = query.filter(db.extract('year', Project.sanctioned_date) == year)
-            except ValueError:
-                pass
-
-    projects = query.order_by(db.cast(Project.serial_no, db.Integer)).all()
-
-    # --- PDF generation logic (same as download_pdf) ---
-    buffer = BytesIO()
-    page_width, page_height = landscape(A4)
-    margin = 30
-    available_width = page_width - 2 * margin
-
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=margin, rightMargin=margin)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    wrap_style = styles['Normal']
-    wrap_style.fontSize = 7
-    wrap_style.leading = 9
-
-    header_row = [
-        Paragraph("S. No.", wrap_style),
-        Paragraph("Nomenclature", wrap_style),
-        Paragraph("Academia / Institute", wrap_style),
-        Paragraph("PI Name", wrap_style),
-        Paragraph("Coordinating Lab", wrap_style),
-        Paragraph("Coordinating Lab Scientist", wrap_style),
-        Paragraph("Research Vertical", wrap_style),
-        Paragraph("Cost (Lakhs)", wrap_style),
-        Paragraph("Sanctioned Date", wrap_style),
-        Paragraph("Original PDC", wrap_style),
-        Paragraph("Revised PDC", wrap_style),
-        Paragraph("Stake Holding Labs", wrap_style),
-        Paragraph("Scope / Objective of the Project", wrap_style),
-        Paragraph("Expected Deliverables / Technology", wrap_style),
-        Paragraph("Outcome Dovetailing with Ongoing Work", wrap_style),
-        Paragraph("RAB Meeting Scheduled Date", wrap_style),
-        Paragraph("RAB Meeting Held Date", wrap_style),
-        Paragraph("GC Meeting Scheduled Date", wrap_style),
-        Paragraph("GC Meeting Held Date", wrap_style),
-        Paragraph("Technical Status", wrap_style),
-        Paragraph("Administrative Status", wrap_style),
-        Paragraph("Final Closure Status", wrap_style)
-    ]
+    spec = filter_spec_from_args(request.args, current_user)
+    filename = f"DIA_CoE_filtered_{datetime.now().strftime('%Y-%m-%d')}.pdf"
+    return pdf_export_response(spec, filename)
 
-    data = [header_row]
-
-    for project in projects:
-        data.append([
-            str(project.serial_no),
-            Paragraph(project.title or '', wrap_style),
-            Paragraph(project.academia or '', wrap_style),
-            Paragraph(project.pi_name or '', wrap_style),
-            Paragraph(project.coord_lab or '', wrap_style),
-            Paragraph(project.scientist or '', wrap_style),
-            Paragraph(project.vertical or '', wrap_style),
-            str(project.cost_lakhs or ''),
-            str(project.sanctioned_date or ''),
-            str(project.original_pdc or ''),
-            str(project.revised_pdc or ''),
-            Paragraph(project.stakeholders or '', wrap_style),
-            Paragraph(project.scope_objective or '', wrap_style),
-            Paragraph(project.expected_deliverables or '', wrap_style),
-            Paragraph(project.Outcome_Dovetailing_with_Ongoing_Work or '', wrap_style),
-            str(project.rab_meeting_date or ''),
-            str(project.rab_meeting_held_date or ''),
-            str(project.gc_meeting_date or ''),
-            str(project.gc_meeting_held_date or ''),
-            Paragraph((project.technical_status or '').replace('\n', '<br/>'), wrap_style),
-            Paragraph(project.administrative_status or '', wrap_style),
-            Paragraph(
-                (project.final_closure_date.strftime('%Y-%m-%d') if project.final_closure_date else '') +
-                ('<br/><b>Remarks:</b> ' + project.final_closure_remarks if project.final_closure_remarks else ''),
-                wrap_style
-            )
-        ])
 
-    col_widths = [
-        20, 100, 65, 65, 60, 70, 60, 50, 75, 75, 75, 70, 75, 75, 75, 75, 75, 75, 75, 70, 65, 70,
-    ]
-    scale_factor = available_width / sum(col_widths)
-    col_widths = [w * scale_factor for w in col_widths]
-
-    table = Table(data, colWidths=col_widths, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 7),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 3),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    buffer.seek(0)
-    filename = f"DIA_CoE_filtered_{datetime.now().strftime('%Y-%m-%d')}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+def bundle_response(entries, filename):
+    # The archive is written while it is sent; the proxy is asked not to buffer it either
+    response = Response(stream_with_context(iter_zip(app.config['UPLOAD_FOLDER'], entries)),
+                        status=200, mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Route for a ZIP of all attachments of one project
+@app.route('/project_bundle/<int:project_id>', methods=['GET'])
+@login_required
+def download_project_bundle(project_id):
+    # Same role scope as the dashboard listing (viewers do not see completed projects)
+    stmt = compile_filter(unfiltered_spec(current_user, restrict_viewer=True)).where(Project.id == project_id)
+    serial_no = db.session.execute(stmt.with_only_columns(Project.serial_no)).scalar()
+    if serial_no is None:
+        abort(404)
+    return bundle_response(project_entries(stmt), f"Project_{serial_no}_attachments.zip")
+
+
+# Route for a ZIP of the attachments of the filtered projects
+@app.route('/download_filtered_bundle', methods=['GET'])
+@login_required
+def download_filtered_bundle():
+    spec = filter_spec_from_args(request.args, current_user, restrict_viewer=True)
+    filename = f"DIA_CoE_filtered_attachments_{datetime.now().strftime('%Y-%m-%d')}.zip"
+    return bundle_response(project_entries(compile_filter(spec)), filename)
+
+
+# Route for starting a background CSV/PDF export (pass filtered=1 with the filter args for a filtered export)
+@app.route('/exports', methods=['POST'])
+@login_required
+def start_export():
+    kind = request.form.get('format', 'csv')
+    if kind not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'Unknown export format.'}), 400
+    if request.form.get('filtered'):
+        spec = filter_spec_from_args(request.form, current_user)
+        filename = f"DIA_CoE_filtered_{datetime.now().strftime('%Y-%m-%d')}.{kind}"
+    else:
+        spec = ALL_PROJECTS
+        filename = f"DIA_CoE_{datetime.now().strftime('%Y-%m-%d')}.{kind}"
+    job = export_jobs.submit(kind, spec, current_user, filename)
+    return jsonify(dict(export_jobs.describe(job), success=True,
+                        status_url=url_for('export_status', job_id=job.id),
+                        download_url=url_for('download_export', job_id=job.id))), 202
+
+
+def get_export_job(job_id):
+    job = db.session.get(ExportJob, job_id)
+    if job is None or (job.user_id != current_user.id and current_user.role != 'admin'):
+        return None
+    return job
+
+
+# Route for polling a background export
+@app.route('/exports/<job_id>', methods=['GET'])
+@login_required
+def export_status(job_id):
+    job = get_export_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Export not found.'}), 404
+    return jsonify(dict(export_jobs.describe(job), success=True))
+
+
+# Route for downloading a finished background export
+@app.route('/exports/<job_id>/download', methods=['GET'])
+@login_required
+def download_export(job_id):
+    job = get_export_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Export not found.'}), 404
+    if job.status != 'done':
+        return jsonify({'success': False, 'message': f'Export is {job.status}.'}), 409
+    path = export_jobs.artifact_path(job.artifact)
+    if not os.path.exists(path):
+        # A newer export of the same filter replaced this file after the data changed
+        return jsonify({'success': False, 'message': 'Export has expired, please start a new one.'}), 410
+    return send_file(path, as_attachment=True, download_name=job.download_name, mimetype=EXPORT_FORMATS[job.kind])
 
 
 #Route for forms
@@ -1911,8 +1142,43 @@ def view_logs():
     if current_user.role != 'admin':
         flash("Unauthorized access.", "danger")
         return redirect(url_for('dashboard'))
-    logs = Log.query.order_by(Log.timestamp.desc()).all()
-    return render_template('main/logs.html', logs=logs, now=datetime.now())
+    # Write this worker's queued entries first so the admin sees their latest actions
+    audit_writer.flush()
+    filters = log_filters_from_args(request.args)
+    users = User.query.order_by(User.username).all()
+
+    if request.args.get('archive'):
+        logs, truncated = search_archive(app.config['LOG_ARCHIVE_DIR'], filters)
+        return render_template('main/logs.html', logs=logs, users=users, filters=filters,
+                               archive=True, truncated=truncated, now=datetime.now())
+
+    before = None
+    before_ts = request.args.get('before_ts', '').strip()
+    before_id = request.args.get('before_id', type=int)
+    if before_ts and before_id is not None:
+        try:
+            before = (datetime.fromisoformat(before_ts), before_id)
+        except ValueError:
+            before = None
+    logs, next_cursor = log_page(filters, before=before)
+
+    # Filter args carried over to the next-page link
+    filter_args = {key: value for key, value in request.args.items()
+                   if key in ('user_id', 'action', 'start', 'end') and value}
+    next_url = None
+    if next_cursor:
+        next_url = url_for('view_logs', before_ts=next_cursor[0].isoformat(), before_id=next_cursor[1], **filter_args)
+    return render_template('main/logs.html', logs=logs, users=users, filters=filters,
+                           next_url=next_url, paged=before is not None,
+                           first_url=url_for('view_logs', **filter_args), now=datetime.now())
+
+# Route for the Prometheus metrics of this worker (Admin only)
+@app.route('/metrics')
+@login_required
+def metrics():
+    if current_user.role != 'admin':
+        return "Unauthorized", 403
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/contact_support')
 @login_required
@@ -1936,6 +1202,85 @@ with app.app_context():
         db.session.add_all([admin_user, viewer_user])
         db.session.commit()
 
+# Version counter that keys the filter and analytics caches
+init_data_version(app)
+
+# Full-text index behind the dashboard search box
+init_search_index(app)
+
+# Worker pool and artifact directory for background exports
+export_jobs.init_app(app)
+
+# Batched writer behind log_action
+audit_writer.init_app(app)
+
+# Latency / SQL / response size instrumentation behind /metrics
+request_metrics.init_app(app)
+
+# Query budget and N+1 warnings while developing
+query_profiler.init_app(app)
+
+
+# CLI command to rebuild the full-text index for an existing database: flask --app app rebuild-search-index
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    with app.app_context():
+        count = rebuild_search_index()
+    print(f"Search index rebuilt: {count} projects indexed.")
+
+
+# CLI command to show the pragmas in effect on a pooled connection: flask --app app db-pragmas
+@app.cli.command('db-pragmas')
+def db_pragmas_command():
+    with app.app_context():
+        effective = sqlite_tuning.check()
+    for name, value in effective.items():
+        print(f"{name} = {value}")
+
+
+# CLI command to check that the date and cost filters and the reminders are answered from their indexes: flask --app app check-query-plans
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    with app.app_context():
+        results = check_filter_plans()
+    failed = []
+    for column, (index, plan, ok) in results.items():
+        if index is None:
+            print(f"{column}: scan (substring match)")
+        else:
+            print(f"{column}: {'uses ' + index if ok else 'MISSING ' + index}")
+        for line in plan:
+            print(f"    {line}")
+        if not ok:
+            failed.append(column)
+    if failed:
+        raise click.ClickException(f"No index used for: {', '.join(failed)}. Run migrate_indexes.py.")
+
+
+# CLI command to delete uploaded files nothing references any more: flask --app app gc-uploads [--dry-run]
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be removed.')
+def gc_uploads_command(dry_run):
+    with app.app_context():
+        removed, reclaimed = collect_garbage(app.config['UPLOAD_FOLDER'], stored_references(),
+                                             grace=app.config['UPLOAD_GC_GRACE_SECONDS'], dry_run=dry_run,
+                                             temp_folder=app.config['UPLOAD_TEMP_FOLDER'])
+    for name in removed:
+        print(name)
+    print(f"{'Would reclaim' if dry_run else 'Reclaimed'} {len(removed)} files, {reclaimed} bytes.")
+
+
+# CLI command to move old audit logs to the compressed archive: flask --app app archive-logs [--days N]
+@app.cli.command('archive-logs')
+@click.option('--days', type=int, default=None, help='Archive rows older than this many days.')
+def archive_logs_command(days):
+    days = days if days is not None else app.config['LOG_RETENTION_DAYS']
+    cutoff = datetime.now() - timedelta(days=days)
+    with app.app_context():
+        audit_writer.flush()
+        moved = archive_old_logs(app.config['LOG_ARCHIVE_DIR'], cutoff)
+    print(f"Archived {moved} log entries older than {cutoff.strftime('%Y-%m-%d')}.")
+
 
 # Route for managing users (Admin only)
 @app.route('/manage_users')
@@ -2023,6 +1368,7 @@ def modify_user():
 
         # Commit the changes to the database
         db.session.commit()
+        invalidate_user(user)
         log_action(current_user, f"Modified user '{username}'")
         flash(f"User '{username}' has been updated successfully.", "success")
         return redirect(url_for('manage_users'))
@@ -2047,8 +1393,9 @@ def delete_user(user_id):
         return redirect(url_for('manage_users'))
 
     db.session.delete(user)
+    log_action(current_user, f"Deleted user '{user.username}'", in_transaction=True)
     db.session.commit()
-    log_action(current_user, f"Deleted user '{user.username}'")
+    invalidate_user(user)
 
     flash(f"User '{user.username}' has been deleted successfully.", "success")
     return redirect(url_for('manage_users'))
@@ -2072,6 +1419,7 @@ def change_role(user_id):
 
     user.role = new_role
     db.session.commit()
+    invalidate_user(user)
     log_action(current_user, f"Changed role for user '{user.username}' to '{new_role}'")
     flash(f"Role for user '{user.username}' updated to '{new_role}'.", "success")
     return redirect(url_for('manage_users'))
@@ -2096,6 +1444,7 @@ def change_password(user_id):
 
     user.password = generate_password_hash(new_password)
     db.session.commit()
+    invalidate_user(user)
     log_action(current_user, f"Changed password for user '{user.username}'")
     flash(f"Password for user '{user.username}' updated successfully.", "success")
     return redirect(url_for('manage_users'))
@@ -2119,14 +1468,11 @@ def view_all_users():
 @app.route('/projects', methods=['GET'])
 @login_required
 def view_projects():
-    if current_user.role == 'manager':
-        # Restrict projects to those with the manager's PI name
-        projects = Project.query.filter(Project.scientist.ilike(f"%{current_user.coord_scientist}%")).all()
-    else:
-        # Admins and viewers can see all projects
-        projects = Project.query.all()
+    # Managers see the projects with their scientist name, admins and viewers all projects
+    projects, next_url = paged_projects(unfiltered_spec(current_user), 'view_projects')
 
-    return render_template('projects/projects.html', projects=projects)
+    return render_template('projects/projects.html', projects=projects, next_url=next_url,
+                           first_url=first_page_url('view_projects'))
 
 
 
@@ -2154,9 +1500,11 @@ def change_own_password():
             flash("Password must be at least 8 characters long and include at least one number, one uppercase letter, and one lowercase letter.", "danger")
             return redirect(url_for('change_own_password'))
 
-        # Update password
-        current_user.password = generate_password_hash(new_password)
+        # Update password (current_user may be a detached copy from the user cache)
+        user = db.session.get(User, current_user.id)
+        user.password = generate_password_hash(new_password)
         db.session.commit()
+        invalidate_user(user)
         log_action(current_user, f"{current_user.username} changed password for {current_user.username} user")
         flash("Password updated successfully.", "success")
         return redirect(url_for('dashboard'))
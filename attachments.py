@@ -0,0 +1,71 @@
+### Attachment records for project and notice form uploads ###
+
+import hashlib
+import os
+import re
+
+from models import Attachment
+
+
+# Project attachment kinds (the mom_type in the upload/remove URLs) and the legacy column each replaced
+PROJECT_ATTACHMENT_COLUMNS = {
+    'duely_signed_forms': 'duely_signed_forms',
+    'rab': 'rab_minutes',
+    'gc': 'gc_minutes',
+    'final_report': 'final_report',
+}
+FORM_ATTACHMENT_KIND = 'form'
+
+UUID_PREFIX = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}_')
+
+# Control characters (C0, DEL, C1) never belong in a displayed file name
+CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+# Length of the original_name column
+ORIGINAL_NAME_LENGTH = 255
+
+
+def clean_original_name(filename):
+    """The uploaded file name as shown to users: its last path component, without control characters."""
+    name = CONTROL_CHARS.sub('', re.split(r'[\\/]', filename or '')[-1]).strip()
+    if name in ('', '.', '..'):
+        name = 'file'
+    return name[:ORIGINAL_NAME_LENGTH]
+
+
+def original_name_of(stored_name):
+    """Best guess at the uploaded name of a file stored before attachments kept it."""
+    if ' ' in stored_name:
+        return stored_name.split(' ', 1)[1]
+    if UUID_PREFIX.match(stored_name):
+        return stored_name[37:]
+    if '_' in stored_name:
+        return stored_name.split('_', 1)[1]
+    return stored_name
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    """Size and sha256 of a stored file, or (None, None) if it is missing."""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+                size += len(chunk)
+    except OSError:
+        return None, None
+    return size, digest.hexdigest()
+
+
+def new_attachment(folder, owner_type, owner_id, kind, stored_name, original_name=None):
+    size, sha256 = file_digest(os.path.join(folder, stored_name))
+    return Attachment(
+        owner_type=owner_type,
+        owner_id=owner_id,
+        kind=kind,
+        stored_name=stored_name,
+        original_name=original_name or original_name_of(stored_name),
+        size=size,
+        sha256=sha256,
+    )
+
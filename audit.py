@@ -0,0 +1,240 @@
+### Batched audit log writer behind log_action ###
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import joinedload
+from models import db, Log
+
+
+LOG_PAGE_SIZE = 50
+# Rows moved per archive batch, and the most archived rows one /logs search returns
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_SEARCH_LIMIT = 500
+
+# Archived rows shaped like Log for logs.html (user is None or has a username)
+ArchivedLog = namedtuple('ArchivedLog', 'id timestamp user action')
+ArchivedUser = namedtuple('ArchivedUser', 'id username')
+
+
+class AuditWriter:
+    """Queues Log rows in-process and writes them in batches from a background thread.
+
+    A batch is written when AUDIT_BATCH_SIZE records are waiting or every
+    AUDIT_FLUSH_INTERVAL seconds, as one multi-row INSERT and one commit, so a
+    request that logs an action pays no commit of its own. Anything still queued
+    is written when the interpreter exits.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._queue = queue.Queue()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('AUDIT_ASYNC', True)
+        app.config.setdefault('AUDIT_BATCH_SIZE', 50)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 2.0)
+        atexit.register(self.flush)
+
+    def record(self, user_id, action, timestamp):
+        self._queue.put({'user_id': user_id, 'action': action, 'timestamp': timestamp})
+        self._ensure_thread()
+        if self._queue.qsize() >= self.app.config['AUDIT_BATCH_SIZE']:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Started on first use rather than at import, so each forked gunicorn worker runs its own
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.app.config['AUDIT_FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every queued record now. Returns the number written."""
+        with self._flush_lock:
+            records = []
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not records:
+                return 0
+            # A fresh app context gets its own session, so a caller's pending changes are never committed here
+            with self.app.app_context():
+                try:
+                    db.session.execute(insert(Log), records)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Failed to write %d audit log records", len(records))
+                    return 0
+            return len(records)
+
+
+audit_writer = AuditWriter()
+
+
+def _parse_date(raw):
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d") if raw else None
+    except ValueError:
+        return None
+
+
+def log_filters_from_args(args):
+    """Normalize the /logs query args; invalid values are dropped."""
+    return {
+        'user_id': args.get('user_id', type=int),
+        'action': args.get('action', '').strip(),
+        'start': _parse_date(args.get('start', '').strip()),
+        'end': _parse_date(args.get('end', '').strip()),
+    }
+
+
+def log_page(filters, before=None, limit=LOG_PAGE_SIZE):
+    """One page of logs, newest first, with the users joined in.
+
+    Keyset-paged on (timestamp, id): before is the (timestamp, id) of the last row
+    of the previous page, so every page is an index range scan of ix_log_timestamp
+    (or ix_log_user_timestamp when filtering by user) however deep it is.
+    Returns (logs, cursor of the next page or None).
+    """
+    stmt = select(Log).options(joinedload(Log.user))
+    if filters['user_id'] is not None:
+        stmt = stmt.where(Log.user_id == filters['user_id'])
+    if filters['action']:
+        stmt = stmt.where(Log.action.ilike(f"%{filters['action']}%"))
+    if filters['start'] is not None:
+        stmt = stmt.where(Log.timestamp >= filters['start'])
+    if filters['end'] is not None:
+        # The end date is inclusive
+        stmt = stmt.where(Log.timestamp < filters['end'] + timedelta(days=1))
+    if before is not None:
+        stmt = stmt.where(tuple_(Log.timestamp, Log.id) < tuple_(*before))
+
+    logs = db.session.execute(stmt.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit + 1)).scalars().all()
+    if len(logs) > limit:
+        logs = logs[:limit]
+        return logs, (logs[-1].timestamp, logs[-1].id)
+    return logs, None
+
+
+## Retention: cold archive of old rows ##
+
+def archive_path(archive_dir, day):
+    return os.path.join(archive_dir, f"log-{day.strftime('%Y-%m-%d')}.jsonl.gz")
+
+
+def archive_old_logs(archive_dir, older_than, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move log rows with a timestamp before older_than into gzip JSONL files, one per day.
+
+    Each batch is appended to its day files (a new gzip member per append) and synced
+    to disk before the same rows are deleted and committed, so a crash can at worst
+    archive a batch twice; archive search drops the duplicate ids. Returns the number
+    of rows moved.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = 0
+    while True:
+        logs = db.session.execute(
+            select(Log).options(joinedload(Log.user))
+            .where(Log.timestamp < older_than)
+            .order_by(Log.timestamp, Log.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not logs:
+            return moved
+
+        by_day = defaultdict(list)
+        for log in logs:
+            by_day[log.timestamp.date()].append({
+                'id': log.id,
+                'user_id': log.user_id,
+                'username': log.user.username if log.user else None,
+                'action': log.action,
+                'timestamp': log.timestamp.isoformat(),
+            })
+        for day, records in by_day.items():
+            with open(archive_path(archive_dir, day), 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as out:
+                    for record in records:
+                        out.write((json.dumps(record) + '\n').encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        db.session.execute(delete(Log).where(Log.id.in_([log.id for log in logs])))
+        db.session.commit()
+        db.session.expunge_all()
+        moved += len(logs)
+
+
+def _archive_days(archive_dir, start, end):
+    # File names carry the day, so only the partitions inside the date range are opened
+    try:
+        names = os.listdir(archive_dir)
+    except OSError:
+        return []
+    days = []
+    for name in names:
+        if not (name.startswith('log-') and name.endswith('.jsonl.gz')):
+            continue
+        try:
+            day = datetime.strptime(name[4:-9], '%Y-%m-%d')
+        except ValueError:
+            continue
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append((day, os.path.join(archive_dir, name)))
+    return sorted(days, reverse=True)
+
+
+def search_archive(archive_dir, filters, limit=ARCHIVE_SEARCH_LIMIT):
+    """Archived logs matching the /logs filters, newest first.
+
+    Returns (logs, truncated) where truncated means more than limit rows matched.
+    """
+    action = filters['action'].lower()
+    found = []
+    seen = set()
+    for day, path in _archive_days(archive_dir, filters['start'], filters['end']):
+        matches = []
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                if filters['user_id'] is not None and record['user_id'] != filters['user_id']:
+                    continue
+                if action and action not in (record['action'] or '').lower():
+                    continue
+                seen.add(record['id'])
+                user = ArchivedUser(record['user_id'], record['username']) if record['username'] else None
+                matches.append(ArchivedLog(record['id'], datetime.fromisoformat(record['timestamp']),
+                                           user, record['action']))
+        matches.sort(key=lambda log: (log.timestamp, log.id), reverse=True)
+        found.extend(matches)
+        if len(found) > limit:
+            return found[:limit], True
+    return found, False
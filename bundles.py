@@ -0,0 +1,141 @@
+### Streamed ZIP bundles of stored attachments ###
+
+import os
+import time
+import zipfile
+
+from models import db, Attachment, Project
+from storage import CHUNK_SIZE
+
+
+# Already compressed formats are stored as they are; deflating them again only costs CPU
+STORED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.pptx', '.zip', '.png', '.jpg', '.jpeg'}
+
+# Folder inside a project's directory for each attachment kind
+KIND_FOLDERS = {
+    'duely_signed_forms': 'Duly Signed Forms',
+    'rab': 'RAB Minutes',
+    'gc': 'GC Minutes',
+    'final_report': 'Final Report',
+}
+
+# Attachment rows pulled from the cursor per batch
+FETCH_BATCH_SIZE = 200
+
+
+class _ZipSink:
+    """Write-only file object for zipfile that keeps only the bytes written since the last drain.
+
+    It has no tell or seek, so zipfile writes each member with a trailing data
+    descriptor instead of seeking back to patch the local header.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _safe_part(name):
+    # Stored original names come from the browser; keep them from adding directories or
+    # becoming traversal segments
+    name = name.replace('/', '_').replace('\\', '_').strip()
+    if name in ('', '.', '..'):
+        return 'file'
+    return name
+
+
+def _unique(arcname, seen):
+    """arcname, or "name (2).ext", "name (3).ext" ... if the bundle already has that path."""
+    base, ext = os.path.splitext(arcname)
+    candidate, n = arcname, 2
+    while candidate in seen:
+        candidate = f"{base} ({n}){ext}"
+        n += 1
+    seen.add(candidate)
+    return candidate
+
+
+def iter_zip(folder, entries):
+    """Yield a ZIP archive of entries, (arcname, stored_name) pairs, as it is written.
+
+    Each file is read from folder in CHUNK_SIZE pieces and the compressed bytes are
+    yielded as soon as zipfile produces them, so neither the archive nor any member
+    is held whole in memory or on disk. PDFs and other STORED_EXTENSIONS are stored
+    without recompression. Files missing from folder are left out.
+    """
+    sink = _ZipSink()
+    seen = set()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for arcname, stored_name in entries:
+            path = os.path.join(folder, stored_name)
+            try:
+                source = open(path, 'rb')
+            except OSError:
+                continue
+            with source:
+                stat = os.fstat(source.fileno())
+                info = zipfile.ZipInfo(_unique(arcname, seen), date_time=time.localtime(stat.st_mtime)[:6])
+                info.file_size = stat.st_size
+                info.external_attr = 0o644 << 16
+                if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w') as member:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        member.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    yield sink.drain()
+
+
+def _stream_rows(stmt):
+    result = db.session.execute(stmt.execution_options(yield_per=FETCH_BATCH_SIZE, stream_results=True))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def project_entries(stmt):
+    """Bundle entries for every attachment of the projects selected by stmt (a compile_filter statement).
+
+    Files are laid out as "<serial no>/<kind folder>/<original name>", in serial order.
+    """
+    projects = stmt.order_by(None).with_only_columns(Project.id, Project.serial_no).subquery()
+    rows = _stream_rows(
+        db.select(projects.c.serial_no, Attachment.kind, Attachment.original_name, Attachment.stored_name)
+        .join(projects, Attachment.owner_id == projects.c.id)
+        .where(Attachment.owner_type == 'project')
+        .order_by(projects.c.serial_no, Attachment.kind, Attachment.id)
+    )
+    for serial_no, kind, original_name, stored_name in rows:
+        folder = _safe_part(KIND_FOLDERS.get(kind, kind))
+        yield f"{serial_no}/{folder}/{_safe_part(original_name)}", stored_name
+
+
+def form_entries(form_id):
+    """Bundle entries for the files of one notice form, in upload order."""
+    rows = _stream_rows(
+        db.select(Attachment.original_name, Attachment.stored_name)
+        .where(Attachment.owner_type == 'form', Attachment.owner_id == form_id)
+        .order_by(Attachment.id)
+    )
+    for original_name, stored_name in rows:
+        yield _safe_part(original_name), stored_name
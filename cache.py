@@ -0,0 +1,111 @@
+### In-process result caches keyed by the project data version ###
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select, update
+from models import db, Project, ProjectStatusEntry, DataVersion
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, name, maxsize=64):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'name': self.name, 'size': len(self._data), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire ttl seconds after they were stored."""
+
+    def __init__(self, name, maxsize=64, ttl=60):
+        super().__init__(name, maxsize)
+        self.ttl = ttl
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            # Counted as a hit by LRUCache.get; move it to the misses
+            with self._lock:
+                self._data.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return value
+
+    def put(self, key, value):
+        super().put(key, (value, time.monotonic() + self.ttl))
+
+
+caches = {}
+
+
+def get_cache(name, maxsize=64, ttl=None):
+    if name not in caches:
+        caches[name] = LRUCache(name, maxsize) if ttl is None else TTLCache(name, maxsize, ttl)
+    return caches[name]
+
+
+def init_data_version(app):
+    with app.app_context():
+        if db.session.get(DataVersion, 1) is None:
+            db.session.add(DataVersion(id=1, version=0))
+            db.session.commit()
+
+
+def data_version():
+    """Current project data version.
+
+    The counter lives in the database rather than in this process so that a write
+    handled by one gunicorn worker invalidates the caches of every worker. Reading
+    it is a single-row primary key lookup.
+    """
+    version = db.session.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar()
+    return version or 0
+
+
+def _bump_data_version(mapper, connection, target):
+    # Runs inside the flush, so a rolled back write also rolls back the bump
+    connection.execute(update(DataVersion).where(DataVersion.id == 1).values(version=DataVersion.version + 1))
+
+
+for _model in (Project, ProjectStatusEntry):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _bump_data_version)
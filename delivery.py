@@ -0,0 +1,90 @@
+### Delivery of stored uploads: proxy offload, ETags and byte ranges ###
+
+import mimetypes
+import os
+import unicodedata
+from urllib.parse import quote
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+
+# FILE_DELIVERY values: stream from the worker, or hand the file to the front proxy
+DELIVERY_MODES = ('python', 'x-sendfile', 'x-accel')
+
+
+def _etag(stat, sha256):
+    # The content hash when the attachment row has one; older files fall back to mtime and size
+    return sha256 or f"{int(stat.st_mtime)}-{stat.st_size}"
+
+
+def _content_disposition(download_name):
+    """Content-Disposition parameters for download_name, with an RFC 5987 form for non-ASCII names."""
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
+    return {'filename': download_name}
+
+
+class FileDelivery:
+    """Sends files from UPLOAD_FOLDER as downloads, chosen by the FILE_DELIVERY setting.
+
+    'python' streams the file from the worker with werkzeug's conditional handling, so
+    If-None-Match is answered with 304 and Range requests with 206. 'x-sendfile'
+    (Apache, lighttpd) and 'x-accel' (nginx) return only the headers and let the proxy
+    send the body and serve ranges; the worker still answers If-None-Match itself.
+    For x-accel, FILE_DELIVERY_ACCEL_PREFIX must be an internal location aliased to
+    UPLOAD_FOLDER. Every response carries a strong ETag and Cache-Control: no-cache,
+    so browsers revalidate downloads instead of fetching them again.
+    """
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('FILE_DELIVERY', 'python')
+        app.config.setdefault('FILE_DELIVERY_ACCEL_PREFIX', '/protected-uploads/')
+        if app.config['FILE_DELIVERY'] not in DELIVERY_MODES:
+            raise ValueError(f"FILE_DELIVERY must be one of {', '.join(DELIVERY_MODES)}")
+
+    def send(self, stored_name, download_name, sha256=None):
+        """Response sending the stored file as an attachment named download_name; 404 if it is missing."""
+        config = current_app.config
+        path = safe_join(config['UPLOAD_FOLDER'], stored_name)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        stat = os.stat(path)
+        etag = _etag(stat, sha256)
+        mode = config['FILE_DELIVERY']
+
+        if mode == 'python':
+            response = send_file(path, as_attachment=True, download_name=download_name, etag=etag,
+                                 conditional=True)
+            # Advertised on full responses too, which is what tells PDF viewers to fetch pages lazily
+            response.accept_ranges = 'bytes'
+            response.cache_control.no_cache = True
+            response.cache_control.private = True
+            return response
+
+        mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers.set('Content-Disposition', 'attachment', **_content_disposition(download_name))
+        response.set_etag(etag)
+        response.last_modified = int(stat.st_mtime)
+        response.cache_control.no_cache = True
+        response.cache_control.private = True
+        response = response.make_conditional(request.environ)
+        # A 304 must not carry the offload header, or the proxy would send the body anyway
+        if response.status_code == 200:
+            if mode == 'x-accel':
+                prefix = config['FILE_DELIVERY_ACCEL_PREFIX'].rstrip('/')
+                response.headers['X-Accel-Redirect'] = f"{prefix}/{quote(stored_name)}"
+            else:
+                response.headers['X-Sendfile'] = os.path.abspath(path)
+        return response
+
+
+file_delivery = FileDelivery()
@@ -0,0 +1,280 @@
+### CSV / PDF export of project rows ###
+
+import csv
+import time
+from io import StringIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from models import db, Project
+from filters import compile_filter
+from status_log import status_texts
+
+
+# Columns read for an export row (the minutes and attachment columns are never exported;
+# technical status comes from the status entries)
+EXPORT_COLUMNS = (
+    Project.serial_no, Project.title, Project.academia, Project.pi_name, Project.coord_lab,
+    Project.scientist, Project.vertical, Project.cost_lakhs, Project.sanctioned_date,
+    Project.original_pdc, Project.revised_pdc, Project.stakeholders, Project.scope_objective,
+    Project.expected_deliverables, Project.Outcome_Dovetailing_with_Ongoing_Work,
+    Project.rab_meeting_date, Project.rab_meeting_held_date, Project.gc_meeting_date,
+    Project.gc_meeting_held_date, Project.administrative_status,
+    Project.final_closure_date, Project.final_closure_remarks,
+)
+
+CSV_HEADER = [
+    "S. No", "Nomenclature", "Academia/Institute", "PI Name", "Coordinating Lab",
+    "Coordinating Lab Scientist", "Research Vertical", "Sanctioned Cost (in Lakhs)",
+    "Sanctioned Date", "Original PDC", "Revised PDC", "Stake Holding Labs",
+    "Scope/Objective of the Project", "Expected Deliverables/Technology",
+    "Outcome Dovetailing with Ongoing Work", "RAB Meeting Scheduled Date",
+    "RAB Meeting Held Date", "GC Meeting Scheduled Date",
+    "GC Meeting Held Date", "Technical Status",
+    "Administrative Status", "Final Closure Status"
+]
+
+# Rows fetched from the cursor per batch, and CSV rows per yielded chunk
+FETCH_BATCH_SIZE = 200
+CSV_CHUNK_ROWS = 100
+
+
+class ExportRow:
+    """A selected row plus the project's technical status history."""
+
+    __slots__ = ('_row', 'technical_status')
+
+    def __init__(self, row, technical_status):
+        self._row = row
+        self.technical_status = technical_status
+
+    def __getattr__(self, name):
+        return getattr(self._row, name)
+
+
+def export_rows(spec):
+    """Stream the export columns of the projects matching spec, in serial order.
+
+    Only the export columns are selected and rows are pulled from the cursor in
+    batches, so no ORM objects are built and the result set is never held whole.
+    Technical status entries are fetched with one query per batch.
+    """
+    stmt = compile_filter(spec).with_only_columns(Project.id, *EXPORT_COLUMNS)
+    result = db.session.execute(stmt.execution_options(yield_per=FETCH_BATCH_SIZE, stream_results=True))
+    try:
+        for batch in result.partitions():
+            statuses = status_texts([row.id for row in batch])
+            for row in batch:
+                yield ExportRow(row, statuses.get(row.id, ''))
+    finally:
+        result.close()
+
+
+def csv_row(project):
+    return [
+        project.serial_no,
+        project.title or '',
+        project.academia or '',
+        project.pi_name or '',
+        project.coord_lab or '',
+        project.scientist or '',
+        project.vertical or '',
+        project.cost_lakhs or '',
+        project.sanctioned_date or '',
+        project.original_pdc or '',
+        project.revised_pdc or '',
+        project.stakeholders or '',
+        project.scope_objective or '',
+        project.expected_deliverables or '',
+        project.Outcome_Dovetailing_with_Ongoing_Work or '',
+        project.rab_meeting_date or '',
+        project.rab_meeting_held_date or '',
+        project.gc_meeting_date or '',
+        project.gc_meeting_held_date or '',
+        (project.technical_status or '').replace('\n', ' | '),
+        project.administrative_status or '',
+        (str(project.final_closure_date) if project.final_closure_date else '') +
+        (" | " + project.final_closure_remarks if project.final_closure_remarks else "")
+    ]
+
+
+def iter_csv(rows):
+    """Yield UTF-8 encoded CSV chunks: the header first, then CSV_CHUNK_ROWS rows at a time."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+
+    def drain():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data.encode('utf-8')
+
+    writer.writerow(CSV_HEADER)
+    yield drain()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(csv_row(row))
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield drain()
+            pending = 0
+    if pending:
+        yield drain()
+
+
+## PDF export ##
+
+PDF_PAGE_SIZE = landscape(A4)
+PDF_MARGIN = 30
+# Projects per table; each chunk is laid out and released before the next is built
+PDF_CHUNK_ROWS = 50
+
+PDF_HEADER = [
+    "S. No.", "Nomenclature", "Academia / Institute", "PI Name", "Coordinating Lab",
+    "Coordinating Lab Scientist", "Research Vertical", "Cost (Lakhs)", "Sanctioned Date",
+    "Original PDC", "Revised PDC", "Stake Holding Labs", "Scope / Objective of the Project",
+    "Expected Deliverables / Technology", "Outcome Dovetailing with Ongoing Work",
+    "RAB Meeting Scheduled Date", "RAB Meeting Held Date", "GC Meeting Scheduled Date",
+    "GC Meeting Held Date", "Technical Status", "Administrative Status", "Final Closure Status"
+]
+
+# Proportional column widths, scaled to the page in pdf_column_widths()
+PDF_COLUMN_WEIGHTS = [
+    20, 100, 65, 65, 60, 70, 60, 50, 75, 75, 75, 70, 75, 75, 75, 75, 75, 75, 75, 70, 65, 70,
+]
+
+# Style objects are built once and shared by every export
+WRAP_STYLE = ParagraphStyle('ExportCell', parent=getSampleStyleSheet()['Normal'], fontSize=7, leading=9)
+
+BODY_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+])
+
+HEADER_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+], parent=BODY_TABLE_STYLE)
+
+
+def pdf_column_widths():
+    available_width = PDF_PAGE_SIZE[0] - 2 * PDF_MARGIN
+    scale_factor = available_width / sum(PDF_COLUMN_WEIGHTS)
+    return [w * scale_factor for w in PDF_COLUMN_WEIGHTS]
+
+
+def pdf_row(project):
+    return [
+        str(project.serial_no),
+        Paragraph(project.title or '', WRAP_STYLE),
+        Paragraph(project.academia or '', WRAP_STYLE),
+        Paragraph(project.pi_name or '', WRAP_STYLE),
+        Paragraph(project.coord_lab or '', WRAP_STYLE),
+        Paragraph(project.scientist or '', WRAP_STYLE),
+        Paragraph(project.vertical or '', WRAP_STYLE),
+        str(project.cost_lakhs or ''),
+        str(project.sanctioned_date or ''),
+        str(project.original_pdc or ''),
+        str(project.revised_pdc or ''),
+        Paragraph(project.stakeholders or '', WRAP_STYLE),
+        Paragraph(project.scope_objective or '', WRAP_STYLE),
+        Paragraph(project.expected_deliverables or '', WRAP_STYLE),
+        Paragraph(project.Outcome_Dovetailing_with_Ongoing_Work or '', WRAP_STYLE),
+        str(project.rab_meeting_date or ''),
+        str(project.rab_meeting_held_date or ''),
+        str(project.gc_meeting_date or ''),
+        str(project.gc_meeting_held_date or ''),
+        Paragraph((project.technical_status or '').replace('\n', '<br/>'), WRAP_STYLE),
+        Paragraph(project.administrative_status or '', WRAP_STYLE),
+        Paragraph(
+            (project.final_closure_date.strftime('%Y-%m-%d') if project.final_closure_date else '') +
+            ('<br/><b>Remarks:</b> ' + project.final_closure_remarks if project.final_closure_remarks else ''),
+            WRAP_STYLE
+        )
+    ]
+
+
+class _LazyFlowables(list):
+    """Flowable list for doc.build() that pulls the next flowable only when the list runs dry.
+
+    build() consumes its list from the front and only looks ahead when it splits a
+    table across pages, so at most one chunk of rows is materialized at a time.
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+
+    def __len__(self):
+        if not list.__len__(self):
+            flowable = next(self._source, None)
+            if flowable is not None:
+                self.append(flowable)
+        return list.__len__(self)
+
+
+def render_pdf(rows, out):
+    """Lay the export rows out as a landscape A4 table and write the PDF to the file object out.
+
+    Rows are turned into tables PDF_CHUNK_ROWS at a time while ReportLab lays out the
+    previous chunk, and the column header is drawn on every page by the page callback
+    instead of being a repeated table row. Returns the row count and the time spent in
+    each phase (fetching and serializing rows, layout and writing).
+    """
+    timings = {'fetch_serialize': 0.0}
+    count = [0]
+    col_widths = pdf_column_widths()
+
+    header = Table([[Paragraph(label, WRAP_STYLE) for label in PDF_HEADER]], colWidths=col_widths)
+    header.setStyle(HEADER_TABLE_STYLE)
+    _, header_height = header.wrap(sum(col_widths), PDF_PAGE_SIZE[1])
+
+    # The header sits directly above the frame's top padding, where the first row starts
+    frame_padding = 6
+    top_margin = 72 + header_height - frame_padding
+    doc = SimpleDocTemplate(out, pagesize=PDF_PAGE_SIZE, leftMargin=PDF_MARGIN, rightMargin=PDF_MARGIN,
+                            topMargin=top_margin)
+
+    def draw_header(canvas, doc):
+        # Tables are as wide as the frame including its side padding, so they start at the margin
+        header.drawOn(canvas, PDF_MARGIN, PDF_PAGE_SIZE[1] - top_margin - frame_padding)
+
+    def chunk_table(batch):
+        table = Table(batch, colWidths=col_widths)
+        table.setStyle(BODY_TABLE_STYLE)
+        return table
+
+    def chunks():
+        started = time.perf_counter()
+        batch = []
+        for row in rows:
+            batch.append(pdf_row(row))
+            count[0] += 1
+            if len(batch) >= PDF_CHUNK_ROWS:
+                table = chunk_table(batch)
+                batch = []
+                timings['fetch_serialize'] += time.perf_counter() - started
+                yield table
+                started = time.perf_counter()
+        timings['fetch_serialize'] += time.perf_counter() - started
+        if batch:
+            yield chunk_table(batch)
+        elif not count[0]:
+            # No projects: still emit a page so the header is drawn
+            yield Spacer(0, 0)
+
+    started = time.perf_counter()
+    doc.build(_LazyFlowables(chunks()), onFirstPage=draw_header, onLaterPages=draw_header)
+    total = time.perf_counter() - started
+    timings['layout_write'] = total - timings['fetch_serialize']
+    timings['total'] = total
+    return count[0], timings
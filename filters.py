@@ -0,0 +1,241 @@
+### Project filter specs shared by the dashboard, analytics and export routes ###
+
+import hashlib
+from collections import namedtuple
+from datetime import date, datetime, MAXYEAR, MINYEAR
+from functools import lru_cache
+
+from sqlalchemy import false, select
+from models import db, Project
+
+
+# Columns filtered with a case-insensitive substring match
+TEXT_FILTER_COLUMNS = (
+    'serial_no', 'title', 'vertical', 'academia', 'pi_name',
+    'coord_lab', 'scientist', 'administrative_status',
+)
+# Columns filtered with an exact date match
+DATE_FILTER_COLUMNS = ('sanctioned_date', 'original_pdc', 'revised_pdc')
+
+# Canonical, hashable form of the filter query string.
+# scope is a tuple describing the role restriction, e.g. ('manager', 'Dr. X') or ('viewer',)
+FilterSpec = namedtuple('FilterSpec', 'scope column value cost_min cost_max year_start year_end')
+
+
+# Every project, with no role scope (the full CSV/PDF downloads)
+ALL_PROJECTS = FilterSpec((), None, None, None, None, None, None)
+
+
+def _parse_float(raw):
+    try:
+        return float(raw) if raw else None
+    except ValueError:
+        return None
+
+
+def _parse_int(raw):
+    try:
+        return int(raw) if raw else None
+    except ValueError:
+        return None
+
+
+def role_scope(user, restrict_viewer=False):
+    if user.role == 'manager':
+        return ('manager', user.coord_scientist)
+    if restrict_viewer and user.role == 'viewer':
+        return ('viewer',)
+    return ()
+
+
+def unfiltered_spec(user, restrict_viewer=False):
+    return FilterSpec(role_scope(user, restrict_viewer), None, None, None, None, None, None)
+
+
+def filter_spec_from_args(args, user, restrict_viewer=False, exact_cost=False):
+    """Normalize the column/value/cost/sanction year query args into a FilterSpec.
+
+    Invalid numbers or dates are dropped, exactly as the old per-route if/elif
+    ladders ignored them. exact_cost treats a plain value on cost_lakhs as an
+    exact match (the modify search page has no min/max inputs).
+    """
+    column = args.get('column', '').strip()
+    value = args.get('value', '').strip()
+    cost_min = cost_max = year_start = year_end = None
+
+    if column in TEXT_FILTER_COLUMNS:
+        value = value.lower() or None
+    elif column in DATE_FILTER_COLUMNS:
+        try:
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            value = None
+    elif column == 'cost_lakhs':
+        if exact_cost and value:
+            cost_min = cost_max = _parse_float(value)
+        else:
+            cost_min = _parse_float(args.get('cost_min', '').strip())
+            cost_max = _parse_float(args.get('cost_max', '').strip())
+        value = None
+    elif column == 'sanction_year':
+        year_start = _parse_int(args.get('sanction_year_start', '').strip())
+        year_end = _parse_int(args.get('sanction_year_end', '').strip())
+        # fallback for single value (if only value is provided)
+        if not (args.get('sanction_year_start', '').strip() or args.get('sanction_year_end', '').strip()):
+            year_start = year_end = _parse_int(value)
+        value = None
+    else:
+        value = None
+
+    if value is None and cost_min is None and cost_max is None and year_start is None and year_end is None:
+        column = None
+
+    return FilterSpec(role_scope(user, restrict_viewer), column, value, cost_min, cost_max, year_start, year_end)
+
+
+def spec_hash(spec):
+    return hashlib.sha1(repr(tuple(spec)).encode('utf-8')).hexdigest()[:16]
+
+
+def has_criteria(spec):
+    return spec.column is not None
+
+
+def sanction_year_clauses(year_start, year_end):
+    """Sanction year bounds as a half-open sanctioned_date range.
+
+    extract('year', ...) has to be evaluated on every row, while a date range can be
+    answered from ix_project_sanctioned_date. Projects without a sanctioned date never
+    match, as before.
+    """
+    clauses = []
+    if year_start is not None:
+        if year_start > MAXYEAR:
+            return [false()]
+        if year_start > MINYEAR:
+            clauses.append(Project.sanctioned_date >= date(year_start, 1, 1))
+    if year_end is not None:
+        if year_end < MINYEAR:
+            return [false()]
+        if year_end < MAXYEAR:
+            clauses.append(Project.sanctioned_date < date(year_end + 1, 1, 1))
+    return clauses or [Project.sanctioned_date.isnot(None)]
+
+
+@lru_cache(maxsize=256)
+def compile_filter(spec):
+    """Build the SELECT for a spec once; statements are immutable so they can be reused."""
+    stmt = select(Project)
+
+    if spec.scope and spec.scope[0] == 'manager':
+        stmt = stmt.where(Project.scientist.ilike(f"%{spec.scope[1]}%"))
+    elif spec.scope and spec.scope[0] == 'viewer':
+        stmt = stmt.where(Project.administrative_status != 'Completed')
+
+    column = spec.column
+    if column in TEXT_FILTER_COLUMNS:
+        stmt = stmt.where(getattr(Project, column).ilike(f"%{spec.value}%"))
+    elif column in DATE_FILTER_COLUMNS:
+        stmt = stmt.where(getattr(Project, column) == spec.value)
+    elif column == 'cost_lakhs':
+        if spec.cost_min is not None:
+            stmt = stmt.where(Project.cost_lakhs >= spec.cost_min)
+        if spec.cost_max is not None:
+            stmt = stmt.where(Project.cost_lakhs <= spec.cost_max)
+    elif column == 'sanction_year':
+        stmt = stmt.where(*sanction_year_clauses(spec.year_start, spec.year_end))
+
+    # serial_no has integer affinity, so its unique index already yields numeric order
+    return stmt.order_by(Project.serial_no)
+
+
+# Date columns behind the dashboard reminder banners
+REMINDER_COLUMNS = ('revised_pdc', 'rab_meeting_date', 'gc_meeting_date')
+
+
+def reminder_query(spec, column, start, end, scientist=None):
+    """Projects matching spec whose date column falls between start and end (inclusive).
+
+    Only id, serial_no, title and the date are selected, and the range is answered from
+    the column's index. PDC reminders skip completed projects; scientist narrows the
+    rows to an exact coordinating scientist (the manager banners).
+    """
+    date_column = getattr(Project, column)
+    stmt = compile_filter(spec).with_only_columns(Project.id, Project.serial_no, Project.title, date_column)
+    stmt = stmt.where(date_column.between(start, end))
+    if column == 'revised_pdc':
+        stmt = stmt.where(db.or_(
+            Project.administrative_status.is_(None),
+            db.func.lower(Project.administrative_status) != 'completed',
+        ))
+    if scientist is not None:
+        stmt = stmt.where(Project.scientist == scientist)
+    return stmt
+
+
+def upcoming_reminders(spec, start, end, scientist=None):
+    """{column: rows} for each of REMINDER_COLUMNS, in serial order."""
+    return {
+        column: db.session.execute(reminder_query(spec, column, start, end, scientist)).all()
+        for column in REMINDER_COLUMNS
+    }
+
+
+def project_page(spec, after=None, limit=50):
+    """One keyset page of the projects matching spec, in serial order.
+
+    after is the serial_no of the last project already shown. Returns the projects
+    and the cursor of the next page (None on the last page). Each page is a bounded
+    walk of the serial_no index, however deep the user scrolls.
+    """
+    stmt = compile_filter(spec)
+    if after is not None:
+        stmt = stmt.where(Project.serial_no > after)
+    projects = db.session.execute(stmt.limit(limit + 1)).scalars().all()
+    if len(projects) > limit:
+        return projects[:limit], projects[limit - 1].serial_no
+    return projects, None
+
+
+## Query plan check ##
+
+# A sample spec for every filter column
+PLAN_CHECK_SPECS = dict(
+    [(column, FilterSpec((), column, 'x', None, None, None, None)) for column in TEXT_FILTER_COLUMNS] +
+    [(column, FilterSpec((), column, date(2024, 1, 1), None, None, None, None)) for column in DATE_FILTER_COLUMNS] +
+    [('cost_lakhs', FilterSpec((), 'cost_lakhs', None, 10.0, 50.0, None, None)),
+     ('sanction_year', FilterSpec((), 'sanction_year', None, None, None, 2020, 2022))]
+)
+
+# Index each range/equality filter must be answered from. The text filters are
+# substring matches (ilike '%x%'), which no B-tree index can serve; the search box
+# uses the full-text index for those.
+PLAN_CHECK_INDEXES = {
+    'sanctioned_date': 'ix_project_sanctioned_date',
+    'original_pdc': 'ix_project_original_pdc',
+    'revised_pdc': 'ix_project_revised_pdc',
+    'cost_lakhs': 'ix_project_cost_lakhs',
+    'sanction_year': 'ix_project_sanctioned_date',
+}
+
+
+def explain(stmt):
+    """SQLite's EXPLAIN QUERY PLAN detail lines for a statement."""
+    sql = str(stmt.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+
+
+def check_filter_plans():
+    """Plan of each filter column's query and of the reminder queries: {name: (expected index or None, plan lines, ok)}."""
+    results = {}
+    for column, spec in PLAN_CHECK_SPECS.items():
+        plan = explain(compile_filter(spec).with_only_columns(Project.id))
+        index = PLAN_CHECK_INDEXES.get(column)
+        ok = index is None or any(line.startswith('SEARCH') and f'INDEX {index} ' in line for line in plan)
+        results[column] = (index, plan, ok)
+    for column in REMINDER_COLUMNS:
+        index = f'ix_project_{column}'
+        plan = explain(reminder_query(ALL_PROJECTS, column, date(2024, 1, 1), date(2024, 1, 31)))
+        ok = any(line.startswith('SEARCH') and f'INDEX {index} ' in line for line in plan)
+        results[f'reminder {column}'] = (index, plan, ok)
+    return results
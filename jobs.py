@@ -0,0 +1,154 @@
+### Background export jobs with cached artifacts ###
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+from models import db, ExportJob
+from filters import compile_filter, spec_hash
+from cache import data_version
+from exports import export_rows, iter_csv, render_pdf
+
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'pdf': 'application/pdf'}
+
+
+class ExportJobQueue:
+    """Runs CSV/PDF exports on a worker thread pool.
+
+    Jobs are recorded in the export_job table and finished files are written to
+    EXPORT_DIR named by (format, filter spec hash, data version), so a second request
+    for the same export before any project changes is served straight from disk.
+    Live row progress is kept in memory by the process running the job, and a job
+    only runs in the process that accepted it, so jobs still queued or running when
+    the app starts were cut off by a restart and are marked failed.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.progress = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('EXPORT_DIR', os.path.join(app.instance_path, 'exports'))
+        app.config.setdefault('EXPORT_WORKERS', 2)
+        os.makedirs(app.config['EXPORT_DIR'], exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=app.config['EXPORT_WORKERS'], thread_name_prefix='export')
+        with app.app_context():
+            self._fail_interrupted()
+
+    def _fail_interrupted(self):
+        interrupted = ExportJob.query.filter(ExportJob.status.in_(('queued', 'running'))).all()
+        for job in interrupted:
+            job.status = 'failed'
+            job.error = 'The export was interrupted by a server restart. Please start it again.'
+            job.finished_at = func.now()
+        if interrupted:
+            db.session.commit()
+            self.app.logger.warning("Marked %d interrupted export jobs as failed", len(interrupted))
+        # Their half-written files can never be finished either
+        for name in os.listdir(self.app.config['EXPORT_DIR']):
+            if name.endswith('.part'):
+                try:
+                    os.remove(self.artifact_path(name))
+                except OSError:
+                    pass
+
+    def artifact_name(self, kind, key, version):
+        return f"{kind}_{key}_{version}.{kind}"
+
+    def artifact_path(self, name):
+        return os.path.join(self.app.config['EXPORT_DIR'], name)
+
+    def submit(self, kind, spec, user, download_name):
+        key = spec_hash(spec)
+        version = data_version()
+        job = ExportJob(id=uuid.uuid4().hex, user_id=user.id, kind=kind, spec_hash=key,
+                        data_version=version, download_name=download_name)
+        name = self.artifact_name(kind, key, version)
+        if os.path.exists(self.artifact_path(name)):
+            source = ExportJob.query.filter_by(artifact=name, status='done').order_by(ExportJob.created_at.desc()).first()
+            job.status = 'done'
+            job.artifact = name
+            job.rows_total = source.rows_total if source else None
+            job.finished_at = func.now()
+        db.session.add(job)
+        db.session.commit()
+        if job.status == 'queued':
+            with self._lock:
+                self.progress[job.id] = 0
+            self.executor.submit(self._run, job.id, kind, spec)
+        return job
+
+    def _counted(self, job_id, rows):
+        for done, row in enumerate(rows, 1):
+            if done % 100 == 0:
+                self.progress[job_id] = done
+            yield row
+
+    def _run(self, job_id, kind, spec):
+        with self.app.app_context():
+            partial = None
+            try:
+                job = db.session.get(ExportJob, job_id)
+                job.data_version = data_version()
+                job.rows_total = db.session.execute(
+                    select(func.count()).select_from(compile_filter(spec).subquery())
+                ).scalar()
+                job.status = 'running'
+                db.session.commit()
+
+                name = self.artifact_name(kind, job.spec_hash, job.data_version)
+                path = self.artifact_path(name)
+                partial = f"{path}.{job_id}.part"
+                with open(partial, 'wb') as out:
+                    rows = self._counted(job_id, export_rows(spec))
+                    if kind == 'csv':
+                        for chunk in iter_csv(rows):
+                            out.write(chunk)
+                    else:
+                        render_pdf(rows, out)
+                os.replace(partial, path)
+                job.status = 'done'
+                job.artifact = name
+                self._remove_stale_artifacts(kind, job.spec_hash, name)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception("Export job %s failed", job_id)
+                job = db.session.get(ExportJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+                if partial and os.path.exists(partial):
+                    os.remove(partial)
+            job.finished_at = func.now()
+            db.session.commit()
+            with self._lock:
+                self.progress.pop(job_id, None)
+
+    def _remove_stale_artifacts(self, kind, key, keep):
+        # Older data versions of the same export can never be served again
+        prefix = f"{kind}_{key}_"
+        for name in os.listdir(self.app.config['EXPORT_DIR']):
+            if name.startswith(prefix) and name.endswith(f".{kind}") and name != keep:
+                try:
+                    os.remove(self.artifact_path(name))
+                except OSError:
+                    pass
+
+    def describe(self, job):
+        rows_done = job.rows_total if job.status == 'done' else self.progress.get(job.id, 0)
+        return {
+            'job_id': job.id,
+            'format': job.kind,
+            'status': job.status,
+            'rows_done': rows_done,
+            'rows_total': job.rows_total,
+            'error': job.error,
+        }
+
+
+export_jobs = ExportJobQueue()
@@ -0,0 +1,142 @@
+### Request instrumentation and Prometheus text for /metrics ###
+
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from models import db
+from cache import caches
+
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _EndpointStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'sql_queries', 'sql_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+
+
+class RequestMetrics:
+    """Per-endpoint latency histograms, SQL count/time and response bytes for this process.
+
+    Each gunicorn worker keeps its own figures, so Prometheus should scrape every
+    worker (or sum what it scrapes). Streamed responses are timed up to the point the
+    response is returned and counted with 0 bytes, since their size is not known yet.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(_EndpointStats)
+        self._statuses = defaultdict(int)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('SLOW_REQUEST_SECONDS', 1.0)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.sql_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Background threads (exports, audit writer) run without a request and are not counted
+        if has_request_context() and 'sql_started' in g and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_seconds += time.perf_counter() - g.sql_started
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        size = 0 if response.is_streamed else (response.content_length or 0)
+
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.sql_queries += g.sql_queries
+            stats.sql_seconds += g.sql_seconds
+            stats.response_bytes += size
+            self._statuses[(endpoint, request.method, response.status_code)] += 1
+
+        if elapsed >= self.app.config['SLOW_REQUEST_SECONDS']:
+            self.app.logger.warning(
+                "Slow request %s %s (%s): %.3fs, %d SQL queries in %.3fs, %d bytes",
+                request.method, request.path, endpoint, elapsed, g.sql_queries, g.sql_seconds, size
+            )
+        return response
+
+    def render(self):
+        """Current figures in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            statuses = sorted(self._statuses.items())
+
+            lines.append('# HELP darpan_request_duration_seconds Request latency by endpoint.')
+            lines.append('# TYPE darpan_request_duration_seconds histogram')
+            for endpoint, stats in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'darpan_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'darpan_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {stats.count}')
+                lines.append(f'darpan_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats.seconds:.6f}')
+                lines.append(f'darpan_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats.count}')
+
+            counters = (
+                ('darpan_request_sql_queries_total', 'SQL statements executed while handling requests.', 'sql_queries', '{}'),
+                ('darpan_request_sql_seconds_total', 'Time spent in SQL while handling requests.', 'sql_seconds', '{:.6f}'),
+                ('darpan_response_bytes_total', 'Bytes in non-streamed response bodies.', 'response_bytes', '{}'),
+            )
+            for name, help_text, attr, fmt in counters:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for endpoint, stats in endpoints:
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} ' + fmt.format(getattr(stats, attr)))
+
+            lines.append('# HELP darpan_requests_total Requests by endpoint, method and status code.')
+            lines.append('# TYPE darpan_requests_total counter')
+            for (endpoint, method, status), count in statuses:
+                lines.append(f'darpan_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+        lines.append('# HELP darpan_cache_hits_total Query result cache hits.')
+        lines.append('# TYPE darpan_cache_hits_total counter')
+        cache_stats = [cache.stats() for cache in caches.values()]
+        for stats in cache_stats:
+            lines.append(f'darpan_cache_hits_total{{cache="{stats["name"]}"}} {stats["hits"]}')
+        lines.append('# HELP darpan_cache_misses_total Query result cache misses.')
+        lines.append('# TYPE darpan_cache_misses_total counter')
+        for stats in cache_stats:
+            lines.append(f'darpan_cache_misses_total{{cache="{stats["name"]}"}} {stats["misses"]}')
+        lines.append('# HELP darpan_cache_entries Entries currently held by each cache.')
+        lines.append('# TYPE darpan_cache_entries gauge')
+        for stats in cache_stats:
+            lines.append(f'darpan_cache_entries{{cache="{stats["name"]}"}} {stats["size"]}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
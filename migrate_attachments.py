@@ -0,0 +1,78 @@
+from app import db, app, NoticeForm  # Import the Flask app
+from models import PROJECT_DETAILS, Project, Attachment
+from sqlalchemy.orm import undefer_group
+from attachments import FORM_ATTACHMENT_KIND, PROJECT_ATTACHMENT_COLUMNS, UUID_PREFIX, new_attachment
+import os
+import re
+
+# Stored upload names never contain whitespace (secure_filename) and keep an allowed extension
+STORED_NAME = re.compile(r'[\w.\-]+\.(pdf|docx?)', re.IGNORECASE)
+
+
+def split_legacy_column(raw, folder):
+    """Split a comma-joined column into stored file names and any leftover text lines.
+
+    rab_minutes and gc_minutes also received newline-separated text from the
+    post_*_minutes_of_meeting endpoints, so only tokens that look like (or are)
+    stored files are taken; lines without any file are kept unchanged.
+    """
+    filenames, text_lines = [], []
+    for line in (raw or '').split('\n'):
+        tokens = [t.strip() for t in line.split(',')]
+        files = [t for t in tokens if t and (STORED_NAME.fullmatch(t) or os.path.isfile(os.path.join(folder, t)))]
+        if not files:
+            if line.strip():
+                text_lines.append(line)
+            continue
+        filenames.extend(files)
+        rest = ', '.join(t for t in tokens if t and t not in files)
+        if rest:
+            text_lines.append(rest)
+    return filenames, '\n'.join(text_lines) or None
+
+
+def migrate():
+    # Push the application context
+    with app.app_context():
+        db.create_all()
+        folder = app.config['UPLOAD_FOLDER']
+        existing = set(db.session.query(
+            Attachment.owner_type, Attachment.owner_id, Attachment.kind, Attachment.stored_name
+        ))
+        created = 0
+
+        def add(owner_type, owner_id, kind, stored_name, original_name=None):
+            nonlocal created
+            if (owner_type, owner_id, kind, stored_name) not in existing:
+                db.session.add(new_attachment(folder, owner_type, owner_id, kind, stored_name, original_name))
+                existing.add((owner_type, owner_id, kind, stored_name))
+                created += 1
+
+        for project in Project.query.options(undefer_group(PROJECT_DETAILS)).order_by(Project.id).all():
+            for kind, column in PROJECT_ATTACHMENT_COLUMNS.items():
+                raw = getattr(project, column)
+                if not raw:
+                    continue
+                filenames, leftover = split_legacy_column(raw, folder)
+                for stored_name in filenames:
+                    add('project', project.id, kind, stored_name)
+                setattr(project, column, leftover)
+
+        for form in NoticeForm.query.order_by(NoticeForm.id).all():
+            if not form.filenames:
+                continue
+            for stored_name in form.filenames.split(','):
+                stored_name = stored_name.strip()
+                if stored_name:
+                    # serve_form only ever stripped the uuid prefix from notice form files
+                    original_name = stored_name[37:] if UUID_PREFIX.match(stored_name) else stored_name
+                    add('form', form.id, FORM_ATTACHMENT_KIND, stored_name, original_name)
+            form.filenames = None
+            form.file_types = None
+
+        db.session.commit()
+        print(f"Migration completed: {created} attachments created.")
+
+
+if __name__ == "__main__":
+    migrate()
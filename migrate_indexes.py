@@ -0,0 +1,28 @@
+from app import db, app  # Import the Flask app
+from sqlalchemy import inspect
+
+
+def migrate():
+    # Push the application context
+    with app.app_context():
+        # db.create_all() only creates indexes together with a new table, so add any
+        # index declared on a model that an existing database is still missing
+        inspector = inspect(db.engine)
+        existing_tables = set(inspector.get_table_names())
+        created = []
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(db.engine)
+                    created.append(index.name)
+        if created:
+            print(f"Migration completed: created {', '.join(created)}.")
+        else:
+            print("Migration skipped: all indexes already exist.")
+
+
+if __name__ == "__main__":
+    migrate()
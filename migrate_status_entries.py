@@ -0,0 +1,52 @@
+from app import db, app  # Import the Flask app
+from models import PROJECT_DETAILS, Project, ProjectStatusEntry
+from sqlalchemy.orm import undefer_group
+from migrate_attachments import split_legacy_column
+from datetime import datetime
+import re
+
+# Lines posted through post_technical_status were stored as "user (YYYY-MM-DD HH:MM): text"
+POSTED_LINE = re.compile(r'^(\S+) \((\d{4}-\d{2}-\d{2} \d{2}:\d{2})\): (.*)$', re.DOTALL)
+
+
+def parse_line(line):
+    match = POSTED_LINE.match(line)
+    if match:
+        author, stamp, text = match.groups()
+        return author, datetime.strptime(stamp, '%Y-%m-%d %H:%M'), text
+    return None, None, line
+
+
+def migrate():
+    # Push the application context
+    with app.app_context():
+        db.create_all()
+        folder = app.config['UPLOAD_FOLDER']
+        created = 0
+
+        for project in Project.query.options(undefer_group(PROJECT_DETAILS)).order_by(Project.id).all():
+            lines = {'technical': (project.technical_status or '').split('\n')}
+            # The minutes columns may also hold comma-joined file names; those stay for migrate_attachments.py
+            for kind, column in (('rab', 'rab_minutes'), ('gc', 'gc_minutes')):
+                filenames, leftover = split_legacy_column(getattr(project, column), folder)
+                lines[kind] = (leftover or '').split('\n')
+                setattr(project, column, ','.join(filenames) or None)
+            project.technical_status = None
+
+            for kind in ('technical', 'rab', 'gc'):
+                for line in lines[kind]:
+                    if not line.strip():
+                        continue
+                    author, timestamp, text = parse_line(line.strip())
+                    # Entries are added in blob order, which keeps id order equal to posting order
+                    db.session.add(ProjectStatusEntry(
+                        project_id=project.id, kind=kind, author=author, timestamp=timestamp, text=text
+                    ))
+                    created += 1
+
+        db.session.commit()
+        print(f"Migration completed: {created} status entries created.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,12 +1,16 @@
 #models.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import deferred, validates
 from datetime import datetime
 
 
 db = SQLAlchemy()
 
+# Deferred group of the long free-text and legacy Project columns. List views never
+# load them; undefer_group(PROJECT_DETAILS) loads them with the row when needed.
+PROJECT_DETAILS = 'details'
+
 # Define the User(for authentication and role-based access) and Log models
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +26,11 @@ class Log(db.Model):
     action = db.Column(db.String(255))
     timestamp = db.Column(db.DateTime, server_default=db.func.now())
     user = db.relationship('User', back_populates='logs')
+
+    __table_args__ = (
+        db.Index('ix_log_timestamp', 'timestamp'),
+        db.Index('ix_log_user_timestamp', 'user_id', 'timestamp'),
+    )
     
 # Define the Project model (for storing project information)
 class Project(db.Model):
@@ -38,25 +47,41 @@ class Project(db.Model):
     original_pdc = db.Column(db.Date)
     revised_pdc = db.Column(db.Date)
     stakeholders = db.Column(db.String(200))
-    scope_objective = db.Column(db.Text, nullable=True)
+    scope_objective = deferred(db.Column(db.Text, nullable=True), group=PROJECT_DETAILS)
     expected_deliverables = db.Column(db.String(300))
-    Outcome_Dovetailing_with_Ongoing_Work=db.Column(db.Text,nullable = True)
+    Outcome_Dovetailing_with_Ongoing_Work=deferred(db.Column(db.Text,nullable = True), group=PROJECT_DETAILS)
     rab_meeting_date = db.Column(db.Date, nullable = True)   
-    duely_signed_forms = db.Column(db.Text, nullable = True)
+    duely_signed_forms = deferred(db.Column(db.Text, nullable = True), group=PROJECT_DETAILS)
     rab_meeting_held_date = db.Column(db.Date, nullable = True)
-    rab_minutes = db.Column(db.Text)
+    rab_minutes = deferred(db.Column(db.Text), group=PROJECT_DETAILS)
     gc_meeting_date = db.Column(db.Date, nullable = True)
     gc_meeting_held_date = db.Column(db.Date, nullable = True)   
-    gc_minutes = db.Column(db.Text)
-    technical_status = db.Column(db.Text, nullable = True)
+    gc_minutes = deferred(db.Column(db.Text), group=PROJECT_DETAILS)
+    technical_status = deferred(db.Column(db.Text, nullable = True), group=PROJECT_DETAILS)
     administrative_status = db.Column(db.String(50), nullable = False, default = "Ongoing")
     final_closure_date = db.Column(db.Date, nullable=True)
-    final_closure_remarks = db.Column(db.Text, nullable=True)
-    final_report = db.Column(db.Text, nullable=True) 
+    final_closure_remarks = deferred(db.Column(db.Text, nullable=True), group=PROJECT_DETAILS)
+    final_report = deferred(db.Column(db.Text, nullable=True), group=PROJECT_DETAILS)
+    # Uploaded files of every kind, loaded for a whole page of projects in one query
+    attachments = db.relationship(
+        'Attachment',
+        primaryjoin="and_(Project.id == foreign(Attachment.owner_id), Attachment.owner_type == 'project')",
+        order_by='Attachment.id', lazy='selectin', viewonly=True
+    )
 
     #constraint
     __table_args__ = (
         db.CheckConstraint('original_pdc >= sanctioned_date', name= 'check_original_pdc'),
+        # Dashboard filters, role scopes, reminders and analytics groupings
+        db.Index('ix_project_scientist', 'scientist'),
+        db.Index('ix_project_administrative_status', 'administrative_status'),
+        db.Index('ix_project_vertical', 'vertical'),
+        db.Index('ix_project_cost_lakhs', 'cost_lakhs'),
+        db.Index('ix_project_sanctioned_date', 'sanctioned_date'),
+        db.Index('ix_project_original_pdc', 'original_pdc'),
+        db.Index('ix_project_revised_pdc', 'revised_pdc'),
+        db.Index('ix_project_rab_meeting_date', 'rab_meeting_date'),
+        db.Index('ix_project_gc_meeting_date', 'gc_meeting_date'),
     )
     
     @validates('original_pdc')
@@ -70,4 +95,75 @@ class Project(db.Model):
         if self.original_pdc and revised_pdc < self.original_pdc:
             raise ValueError("Revised PDC cannot be before the Original PDC.")
         return revised_pdc
-    
\ No newline at end of file
+
+    def attachments_of(self, kind):
+        return [a for a in self.attachments if a.kind == kind]
+
+
+# Uploaded file belonging to a project (owner_type 'project') or a notice form (owner_type 'form')
+class Attachment(db.Model):
+    id = db.Column(db.Integer, primary_key = True)
+    owner_type = db.Column(db.String(20), nullable = False)
+    owner_id = db.Column(db.Integer, nullable = False)
+    kind = db.Column(db.String(30), nullable = False)
+    stored_name = db.Column(db.String(255), nullable = False, index = True)
+    original_name = db.Column(db.String(255), nullable = False)
+    size = db.Column(db.Integer)
+    sha256 = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_attachment_owner', 'owner_type', 'owner_id', 'kind'),
+    )
+
+    @property
+    def file_type(self):
+        return self.original_name.rsplit('.', 1)[1].lower() if '.' in self.original_name else ''
+
+
+# One technical status update or RAB/GC minutes note; rows are only ever appended, so id order is posting order
+class ProjectStatusEntry(db.Model):
+    id = db.Column(db.Integer, primary_key = True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable = False)
+    kind = db.Column(db.String(20), nullable = False)
+    author = db.Column(db.String(50))
+    timestamp = db.Column(db.DateTime, server_default=db.func.now())
+    text = db.Column(db.Text, nullable = False)
+
+    __table_args__ = (
+        db.Index('ix_status_entry_project', 'project_id', 'kind', 'id'),
+        db.Index('ix_status_entry_timestamp', 'timestamp'),
+    )
+
+    @property
+    def line(self):
+        return status_line(self.author, self.timestamp, self.text)
+
+
+def status_line(author, timestamp, text):
+    # Same "user (YYYY-MM-DD HH:MM): text" form the old technical_status blob stored
+    if author and timestamp:
+        return f"{author} ({timestamp.strftime('%Y-%m-%d %H:%M')}): {text}"
+    return text
+
+
+# Single-row counter bumped on every Project write, used to key cached query results
+class DataVersion(db.Model):
+    id = db.Column(db.Integer, primary_key = True)
+    version = db.Column(db.Integer, nullable = False, default = 0)
+
+
+# Background CSV/PDF export job (see jobs.py); finished files live under instance/exports
+class ExportJob(db.Model):
+    id = db.Column(db.String(32), primary_key = True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable = False)
+    kind = db.Column(db.String(10), nullable = False)
+    spec_hash = db.Column(db.String(16), nullable = False)
+    data_version = db.Column(db.Integer)
+    status = db.Column(db.String(10), nullable = False, default = "queued")
+    rows_total = db.Column(db.Integer)
+    artifact = db.Column(db.String(255))
+    download_name = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    finished_at = db.Column(db.DateTime)
@@ -0,0 +1,89 @@
+### Development-mode SQL query budget and N+1 detector ###
+
+import re
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """Query shape: literals and IN lists collapsed so the same query with different values groups together."""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('(?...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryProfiler:
+    """Counts the statements of each request and flags budget overruns and N+1 candidates.
+
+    Enabled by QUERY_PROFILER (defaults to on in debug and testing). A request over its
+    budget (QUERY_BUDGETS[endpoint], else QUERY_BUDGET) is logged as a warning, or raises
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT is set so test runs fail on regressions.
+    A query shape run N_PLUS_ONE_THRESHOLD or more times in one request is reported as a
+    likely per-row lazy load.
+    """
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        # None means on whenever the app runs in debug or testing mode
+        app.config.setdefault('QUERY_PROFILER', None)
+        app.config.setdefault('QUERY_BUDGET', 25)
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGET_STRICT', False)
+        app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        with app.app_context():
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_request(self):
+        enabled = self.app.config['QUERY_PROFILER']
+        if enabled is None:
+            enabled = self.app.debug or self.app.testing
+        if enabled:
+            g.query_shapes = Counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_shapes' in g:
+            g.query_shapes[normalize_sql(statement)] += 1
+
+    def _after_request(self, response):
+        shapes = g.pop('query_shapes', None)
+        if shapes is None:
+            return response
+        total = sum(shapes.values())
+        endpoint = request.endpoint or 'unmatched'
+        response.headers['X-Query-Count'] = str(total)
+
+        threshold = self.app.config['N_PLUS_ONE_THRESHOLD']
+        for shape, count in shapes.most_common():
+            if count < threshold:
+                break
+            self.app.logger.warning("Possible N+1 in %s: %d x %s", endpoint, count, shape)
+
+        budget = self.app.config['QUERY_BUDGETS'].get(endpoint, self.app.config['QUERY_BUDGET'])
+        if total > budget:
+            message = f"{endpoint} ran {total} SQL queries (budget {budget})"
+            if self.app.config['QUERY_BUDGET_STRICT']:
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning(message)
+        return response
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,154 @@
+### Full-text project search (SQLite FTS5) used by ajax_search_projects ###
+
+import re
+
+from sqlalchemy import Float, Integer, event, select, text
+from models import db, Project, ProjectStatusEntry
+from status_log import status_texts
+
+
+FTS_TABLE = 'project_fts'
+
+# Indexed columns and their BM25 weights (serial number and title rank highest)
+FTS_COLUMNS = (
+    ('serial_no', 10.0),
+    ('title', 5.0),
+    ('pi_name', 3.0),
+    ('expected_deliverables', 2.0),
+    ('scope_objective', 1.0),
+    ('technical_status', 1.0),
+)
+
+# Project columns read for the index; technical_status is built from the status entries
+PROJECT_COLUMNS = [getattr(Project, name) for name, _ in FTS_COLUMNS if name != 'technical_status']
+
+DEFAULT_RESULT_LIMIT = 50
+
+_state = {'enabled': False}
+
+
+def _insert_row(connection, row, technical_status):
+    names = ', '.join(name for name, _ in FTS_COLUMNS)
+    params = ', '.join(f':{name}' for name, _ in FTS_COLUMNS)
+    values = {name: str(getattr(row, name, None) or '') for name, _ in FTS_COLUMNS}
+    values['technical_status'] = technical_status or ''
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, {names}) VALUES (:rowid, {params})"),
+        dict(values, rowid=row.id)
+    )
+
+
+def _delete_row(connection, project_id):
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {'rowid': project_id})
+
+
+def _reindex_project(connection, project_id):
+    # Reads through the flush connection, so it sees the row and entries being written
+    _delete_row(connection, project_id)
+    row = connection.execute(select(Project.id, *PROJECT_COLUMNS).where(Project.id == project_id)).first()
+    if row is not None:
+        _insert_row(connection, row, status_texts([project_id], connection=connection).get(project_id))
+
+
+def init_search_index(app):
+    """Create the FTS5 table if needed and keep it in sync with Project writes.
+
+    Falls back to the plain ilike search when the database is not SQLite or the
+    SQLite build has no FTS5 module.
+    """
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        columns = ', '.join(name for name, _ in FTS_COLUMNS)
+        try:
+            with db.engine.begin() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': FTS_TABLE}
+                ).first()
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5({columns}, tokenize = 'unicode61', prefix = '2 3')"
+                ))
+        except Exception as e:
+            print(f"Full-text search disabled: {e}")
+            return False
+        _state['enabled'] = True
+        if not exists:
+            rebuild_search_index()
+    return True
+
+
+def rebuild_search_index():
+    """Repopulate the index from the project table. Returns the number of rows indexed."""
+    with db.engine.begin() as connection:
+        rows = connection.execute(select(Project.id, *PROJECT_COLUMNS)).all()
+        statuses = status_texts([row.id for row in rows], connection=connection)
+        connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        for row in rows:
+            _insert_row(connection, row, statuses.get(row.id))
+    return len(rows)
+
+
+def _match_expression(query):
+    # Every word must match as a prefix; quoting keeps FTS5 operators out of user input
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _with_exact_serial(query, projects, limit):
+    # A number typed on its own is most likely a serial number: that project goes first,
+    # ahead of the longer serials it is a prefix of
+    # ASCII digits only (int() rejects e.g. '²') and short enough for a 64-bit SQLite INTEGER
+    if not (query.isascii() and query.isdigit() and len(query) <= 18):
+        return projects
+    exact = db.session.execute(select(Project).where(Project.serial_no == int(query))).scalar()
+    if exact is None:
+        return projects
+    return [exact] + [project for project in projects if project.id != exact.id][:limit - 1]
+
+
+def search_projects(query, limit=DEFAULT_RESULT_LIMIT):
+    """Projects whose indexed text matches every word of query as a prefix, ranked by BM25.
+
+    A numeric query that is an exact serial number lists that project first.
+    """
+    query = query.strip()
+    if not _state['enabled']:
+        projects = Project.query.filter(
+            (Project.serial_no.ilike(f"%{query}%")) |
+            (Project.title.ilike(f"%{query}%"))
+        ).limit(limit).all()
+        return _with_exact_serial(query, projects, limit)
+
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    weights = ', '.join(str(weight) for _, weight in FTS_COLUMNS)
+    # The ranked matches are joined to the project rows, so results load in one query
+    ranked = text(
+        f"SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :expr ORDER BY rank LIMIT :limit"
+    ).bindparams(expr=expression, limit=limit).columns(id=Integer, rank=Float).subquery('ranked')
+    stmt = select(Project).join(ranked, Project.id == ranked.c.id).order_by(ranked.c.rank)
+    return _with_exact_serial(query, db.session.execute(stmt).scalars().all(), limit)
+
+
+@event.listens_for(Project, 'after_insert')
+@event.listens_for(Project, 'after_update')
+def _index_written(mapper, connection, target):
+    if _state['enabled']:
+        _reindex_project(connection, target.id)
+
+
+@event.listens_for(Project, 'after_delete')
+def _index_deleted(mapper, connection, target):
+    if _state['enabled']:
+        _delete_row(connection, target.id)
+
+
+@event.listens_for(ProjectStatusEntry, 'after_insert')
+@event.listens_for(ProjectStatusEntry, 'after_delete')
+def _index_status_entry(mapper, connection, target):
+    if _state['enabled'] and target.kind == 'technical':
+        _reindex_project(connection, target.project_id)
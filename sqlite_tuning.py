@@ -0,0 +1,84 @@
+### SQLite connection pragmas and the startup pragma check ###
+
+from sqlalchemy import event, text
+from models import db
+
+
+# Applied to every new connection, in this order. journal_mode=WAL lets readers (exports,
+# dashboards) run alongside a writer instead of blocking on the rollback journal.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power loss can drop the last commits but never corrupts the file
+    'synchronous': 'NORMAL',
+    # Milliseconds a writer waits for the lock before raising "database is locked"
+    'busy_timeout': 5000,
+    # Negative values are KiB, so about 20 MB of page cache per connection
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# PRAGMA reads return numbers for these enumerated settings
+_PRAGMA_CODES = {
+    'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3},
+    'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2},
+}
+
+
+def _expected(name, value):
+    if name in _PRAGMA_CODES and isinstance(value, str):
+        return _PRAGMA_CODES[name][value.upper()]
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+class SQLiteTuning:
+    """Sets SQLITE_PRAGMAS on each connection through the engine connect event.
+
+    Must be initialised right after db.init_app so that the connection used by
+    create_all is already tuned. The effective values are read back once at start-up
+    and any pragma SQLite did not accept (e.g. WAL on a network file system) is
+    logged as a warning.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.pragmas = {}
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+        self.pragmas = dict(app.config['SQLITE_PRAGMAS'])
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                return
+            event.listen(db.engine, 'connect', self._on_connect)
+            self.check()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    def report(self):
+        """Effective value of each configured pragma on a pooled connection."""
+        with db.engine.connect() as connection:
+            return {name: connection.execute(text(f'PRAGMA {name}')).scalar() for name in self.pragmas}
+
+    def check(self):
+        effective = self.report()
+        self.app.logger.info('SQLite pragmas: %s', ', '.join(f'{k}={v}' for k, v in effective.items()))
+        for name, value in self.pragmas.items():
+            actual = effective[name]
+            if isinstance(actual, str):
+                actual = actual.lower()
+            if actual != _expected(name, value):
+                self.app.logger.warning('SQLite pragma %s is %s, expected %s', name, effective[name], value)
+        return effective
+
+
+sqlite_tuning = SQLiteTuning()
@@ -0,0 +1,78 @@
+### Technical status updates and RAB/GC minutes kept as append-only entries ###
+
+from collections import defaultdict
+from datetime import datetime
+
+from pytz import timezone
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from models import db, ProjectStatusEntry, status_line
+
+
+STATUS_KINDS = ('technical', 'rab', 'gc')
+
+# Entries shown per project on the dashboard, and per page of the older-entries endpoint
+DEFAULT_LATEST_ENTRIES = 3
+DEFAULT_PAGE_SIZE = 20
+
+
+def add_status_entry(project_id, kind, author, text):
+    """Append one entry. Nothing already stored is read or rewritten."""
+    entry = ProjectStatusEntry(
+        project_id=project_id,
+        kind=kind,
+        author=author,
+        timestamp=datetime.now(timezone('Asia/Kolkata')),
+        text=text,
+    )
+    db.session.add(entry)
+    return entry
+
+
+def latest_status_entries(project_ids, kinds=('technical',), limit=DEFAULT_LATEST_ENTRIES):
+    """Latest entries per (project id, kind) for a page of projects, in one query.
+
+    Returns {(project_id, kind): (entries oldest first, has_older)}.
+    """
+    if not project_ids:
+        return {}
+    E = ProjectStatusEntry
+    ranked = select(
+        E,
+        func.row_number().over(partition_by=(E.project_id, E.kind), order_by=E.id.desc()).label('rank')
+    ).where(E.project_id.in_(project_ids), E.kind.in_(kinds)).subquery()
+    entry = aliased(E, ranked)
+    # One extra row per group tells whether older entries exist
+    rows = db.session.execute(
+        select(entry).where(ranked.c.rank <= limit + 1).order_by(ranked.c.project_id, ranked.c.id)
+    ).scalars()
+
+    grouped = defaultdict(list)
+    for e in rows:
+        grouped[(e.project_id, e.kind)].append(e)
+    return {key: (entries[-limit:], len(entries) > limit) for key, entries in grouped.items()}
+
+
+def status_page(project_id, kind, before=None, limit=DEFAULT_PAGE_SIZE):
+    """Entries older than the entry id before (newest first), keyset-paged on the project index."""
+    E = ProjectStatusEntry
+    stmt = select(E).where(E.project_id == project_id, E.kind == kind)
+    if before is not None:
+        stmt = stmt.where(E.id < before)
+    return db.session.execute(stmt.order_by(E.id.desc()).limit(limit)).scalars().all()
+
+
+def status_texts(project_ids, kind='technical', connection=None):
+    """Full entry history per project as newline-joined lines, for exports and the search index."""
+    if not project_ids:
+        return {}
+    E = ProjectStatusEntry
+    stmt = (
+        select(E.project_id, E.author, E.timestamp, E.text)
+        .where(E.project_id.in_(project_ids), E.kind == kind)
+        .order_by(E.project_id, E.id)
+    )
+    lines = defaultdict(list)
+    for row in (connection or db.session).execute(stmt):
+        lines[row.project_id].append(status_line(row.author, row.timestamp, row.text))
+    return {project_id: '\n'.join(entries) for project_id, entries in lines.items()}
@@ -0,0 +1,258 @@
+### Content-addressed store for uploaded files ###
+
+import errno
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from models import db, Attachment
+
+
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = '.upload-'
+# Unreferenced files younger than this are left alone: an upload is written before the
+# row that references it is committed, and a duplicate upload refreshes the file's mtime
+GC_GRACE_SECONDS = 3600
+
+# Leading bytes every upload with this extension must start with
+MAGIC_BYTES = {'.pdf': b'%PDF-'}
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+class UploadFileTooLarge(RequestEntityTooLarge):
+    """One uploaded file went over MAX_UPLOAD_FILE_SIZE (rather than the whole request over MAX_CONTENT_LENGTH)."""
+
+
+def content_name(sha256, filename):
+    """Stored name of a file: its sha256 plus the uploaded name's extension."""
+    ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return f"{sha256}{ext}"
+
+
+def _existing_copy(folder, sha256):
+    """Stored name of a file already holding this content (including files saved before the store), if any."""
+    names = db.session.execute(
+        db.select(Attachment.stored_name).where(Attachment.sha256 == sha256).distinct()
+    ).scalars()
+    for name in names:
+        if os.path.isfile(os.path.join(folder, name)):
+            return name
+    return None
+
+
+def _temp_path(folder):
+    return os.path.join(folder, f"{TEMP_PREFIX}{uuid.uuid4().hex}.part")
+
+
+class _UploadCheck:
+    """Running sha256, size limit and magic byte check over the chunks of one upload."""
+
+    def __init__(self, filename, max_size=None):
+        self.filename = filename
+        self.max_size = max_size
+        self.magic = MAGIC_BYTES.get(os.path.splitext(filename or '')[1].lower(), b'')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+
+    def update(self, chunk):
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadFileTooLarge(f"{self.filename} is larger than {self.max_size} bytes.")
+        if len(self.head) < len(self.magic):
+            self.head += chunk[:len(self.magic) - len(self.head)]
+        self.digest.update(chunk)
+
+    @property
+    def valid(self):
+        return self.head == self.magic
+
+    def verify(self):
+        if not self.valid:
+            raise InvalidUpload(f"{self.filename} is not a valid {self.magic.decode().strip('%-')} file.")
+
+
+def _move(temp_path, target):
+    try:
+        os.replace(temp_path, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # The temporary folder is on another file system: copy the validated file next to
+        # the target first, so it still appears under its final name in one rename
+        staging = _temp_path(os.path.dirname(target))
+        try:
+            shutil.copyfile(temp_path, staging)
+            os.replace(staging, target)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        os.remove(temp_path)
+
+
+def _place(folder, temp_path, sha256, filename):
+    """Move a fully written and validated temporary file to its content address, or drop it if that content is stored."""
+    stored_name = _existing_copy(folder, sha256) or content_name(sha256, filename)
+    target = os.path.join(folder, stored_name)
+    if os.path.exists(target):
+        os.remove(temp_path)
+        # Mark the shared copy as in use so a concurrent release or GC keeps it
+        os.utime(target)
+    else:
+        _move(temp_path, target)
+    return stored_name
+
+
+class UploadSpool:
+    """File object the request parser writes an uploaded file part into.
+
+    The part goes straight to a temporary file in a private folder (never the public
+    store) in the parser's chunks. It is hashed, size-checked and magic-checked on the
+    way in, so storing it is a rename and the upload is never held in memory or copied
+    a second time. An upload that is never stored is deleted when the request closes
+    its files; one cut off by a dropped connection is left to collect_garbage.
+    """
+
+    def __init__(self, temp_folder, filename, max_size=None):
+        self.path = _temp_path(temp_folder)
+        self.check = _UploadCheck(filename, max_size)
+        self._file = open(self.path, 'w+b')
+        self._stored = False
+
+    def write(self, data):
+        try:
+            self.check.update(data)
+        except UploadFileTooLarge:
+            # The parser drops a part it fails on without closing it
+            self.close()
+            raise
+        return self._file.write(data)
+
+    def store(self, folder, filename):
+        self._file.flush()
+        self.check.verify()
+        stored_name = _place(folder, self.path, self.check.digest.hexdigest(), filename)
+        self._stored = True
+        return stored_name, self.check.size, self.check.digest.hexdigest()
+
+    def close(self):
+        self._file.close()
+        if not self._stored and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, seek, tell, readline, flush ... go to the underlying file
+        return getattr(self._file, name)
+
+
+class StreamingUploadRequest(Request):
+    """Request class that spools file uploads into UPLOAD_TEMP_FOLDER, limited to MAX_UPLOAD_FILE_SIZE each."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        return UploadSpool(config['UPLOAD_TEMP_FOLDER'], filename, config.get('MAX_UPLOAD_FILE_SIZE'))
+
+
+def store_stream(folder, stream, filename, temp_folder=None):
+    """Write an upload to the store, hashing it as it is copied. Returns (stored_name, size, sha256).
+
+    A part already spooled by StreamingUploadRequest is only renamed. Any other stream
+    is copied in CHUNK_SIZE pieces to a temporary file in temp_folder (default folder)
+    and moved into folder once it is checked. Either way, if the
+    content is already stored the new copy is dropped and the existing file reused, so
+    each distinct file is kept on disk once however often it is attached. Raises
+    InvalidUpload when the content does not match the file extension.
+    """
+    if isinstance(stream, UploadSpool):
+        return stream.store(folder, filename)
+    temp_path = _temp_path(temp_folder or folder)
+    check = _UploadCheck(filename)
+    try:
+        with open(temp_path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                check.update(chunk)
+                out.write(chunk)
+        check.verify()
+        stored_name = _place(folder, temp_path, check.digest.hexdigest(), filename)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return stored_name, check.size, check.digest.hexdigest()
+
+
+def reference_counts(names):
+    """{stored_name: number of attachment rows referencing it} for the given names."""
+    counts = dict.fromkeys(names, 0)
+    if counts:
+        rows = db.session.execute(
+            db.select(Attachment.stored_name, db.func.count())
+            .where(Attachment.stored_name.in_(list(counts)))
+            .group_by(Attachment.stored_name)
+        )
+        counts.update(rows.all())
+    return counts
+
+
+def _stale(path, now, grace):
+    try:
+        return now - os.path.getmtime(path) >= grace
+    except OSError:
+        return False
+
+
+def remove_unreferenced(folder, names, referenced, grace=GC_GRACE_SECONDS):
+    """Delete the files among names that are not in referenced and older than grace seconds.
+
+    Returns the names removed. A recently written file is kept for the garbage
+    collector, since another upload of the same content may be about to reference it.
+    """
+    now = time.time()
+    removed = []
+    for name in set(names) - set(referenced):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and _stale(path, now, grace):
+            try:
+                os.remove(path)
+                removed.append(name)
+            except OSError:
+                pass
+    return removed
+
+
+def collect_garbage(folder, referenced, grace=GC_GRACE_SECONDS, dry_run=False, temp_folder=None):
+    """Reclaim stored files that no row references. Returns (names, bytes) reclaimed.
+
+    referenced is every stored name still in use. Abandoned temporary upload files,
+    in folder or temp_folder, are removed too. Files younger than grace seconds are
+    never touched.
+    """
+    now = time.time()
+    removed, reclaimed = [], 0
+    entries = list(os.scandir(folder))
+    if temp_folder and os.path.isdir(temp_folder):
+        entries += [entry for entry in os.scandir(temp_folder) if entry.name.startswith(TEMP_PREFIX)]
+    for entry in entries:
+        if not entry.is_file():
+            continue
+        if entry.name.startswith('.') and not entry.name.startswith(TEMP_PREFIX):
+            continue
+        if entry.name in referenced or not _stale(entry.path, now, grace):
+            continue
+        size = entry.stat().st_size
+        if not dry_run:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+        removed.append(entry.name)
+        reclaimed += size
+    return removed, reclaimed
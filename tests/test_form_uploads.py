@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+import werkzeug
+from werkzeug.security import generate_password_hash
+
+REPO = Path(__file__).resolve().parents[1]
+
+# Flask 2.3's test client reads werkzeug.__version__, which Werkzeug 3 no longer defines
+if not hasattr(werkzeug, '__version__'):
+    werkzeug.__version__ = '3'
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    # The app opens instance/site.db and writes uploads to static/forms relative to the
+    # working directory, so it runs from a copy of the tree
+    root = tmp_path_factory.mktemp('app')
+    for path in REPO.glob('*.py'):
+        shutil.copy(path, root)
+    shutil.copytree(REPO / 'templates', root / 'templates')
+    (root / 'static' / 'forms').mkdir(parents=True)
+    (root / 'instance').mkdir()
+    shutil.copy(REPO / 'instance' / 'site.db', root / 'instance')
+
+    cwd = os.getcwd()
+    os.chdir(root)
+    sys.path.insert(0, str(root))
+    try:
+        from app import app, db
+        from models import User
+        app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+        with app.app_context():
+            db.session.add(User(username='uploader', password=generate_password_hash('Pass123$x'), role='viewer'))
+            db.session.commit()
+        client = app.test_client()
+        assert client.post('/', data={'username': 'uploader', 'password': 'Pass123$x'}).status_code == 302
+        yield client
+    finally:
+        sys.path.remove(str(root))
+        os.chdir(cwd)
+
+
+def upload_form(client, form_no, filename):
+    return client.post('/upload_form', data={
+        'form_no': form_no, 'title': 'Test form', 'submission_schedule': 'Any time',
+        'files': [(io.BytesIO(b'%PDF-1.4 test'), filename)],
+    }, content_type='multipart/form-data')
+
+
+def test_form_file_name_is_escaped(client):
+    assert upload_form(client, 'XSS-1', '<img src=x onerror=alert(1)>.pdf').status_code == 302
+    html = client.get('/forms').data.decode()
+    assert '<img src=x onerror=alert(1)>' not in html
+    assert '&lt;img src=x onerror=alert(1)&gt;.pdf' in html
+
+
+def test_form_file_name_is_cleaned(client):
+    from models import Attachment
+    assert upload_form(client, 'PATH-1', '../../up\x07load\t.pdf').status_code == 302
+    with client.application.app_context():
+        names = [a.original_name for a in Attachment.query.filter_by(owner_type='form')]
+    assert 'upload.pdf' in names